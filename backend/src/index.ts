@@ -289,6 +289,8 @@ export default {
     const headers = {
       "content-type": obj.httpMetadata?.contentType || "application/octet-stream",
       "cache-control": "private, max-age=60",
+      // content-derived; lets the renderer reuse identical audio across jobs
+      "etag": obj.httpEtag,
     };
 
     return req.method === "HEAD"
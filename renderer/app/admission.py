@@ -0,0 +1,99 @@
+# renderer/app/admission.py
+import math, os, threading
+from typing import List, Optional
+
+from .worker import RENDER_WORKERS
+
+# Cost units are rough worker-seconds; tune per node type with app.loadtest.
+COST_JOB_BASE     = float(os.getenv("COST_JOB_BASE", "6"))       # downloads, audio concat, final concat/upload
+COST_PER_SCENE    = float(os.getenv("COST_PER_SCENE", "4"))      # one Manim scene + mux
+COST_PER_CELL     = float(os.getenv("COST_PER_CELL", "0.15"))    # per array cell, per scene (Text mobjects)
+COST_PER_AUDIO    = float(os.getenv("COST_PER_AUDIO", "0.3"))    # per narration clip fetched/probed
+COST_PER_RENDITION = float(os.getenv("COST_PER_RENDITION", "0.6")) # per scene, per extra 720p-sized rendition encode
+COST_HEIGHT       = 720                                            # the per-scene costs above are for 720p
+DEFAULT_ARRAY_LEN = int(os.getenv("DEFAULT_ARRAY_LEN", "8"))
+# committed work a node accepts: every worker busy plus this much queued behind each
+RENDER_CAPACITY   = float(os.getenv("RENDER_CAPACITY", str(RENDER_WORKERS * 240)))
+
+
+def _pixels(height: int) -> float:
+    # 16:9 frames, so pixel count relative to 720p is the squared height ratio
+    return (height / COST_HEIGHT) ** 2
+
+def estimate_cost(audio_clips: int, scenes: Optional[int] = None, max_array: Optional[int] = None,
+                  ladder: Optional[List[int]] = None) -> float:
+    """
+    Estimated worker-seconds for a job; scenes defaults to one per narration clip.
+    ladder is the rendition heights: scenes render at the top one, scaled by its
+    pixel count, and every lower rendition is one more encode of the whole video.
+    """
+    n_scenes = scenes if scenes is not None else audio_clips
+    cells = max_array if max_array is not None else DEFAULT_ARRAY_LEN
+    top, *rest = sorted(ladder or [COST_HEIGHT], reverse=True)
+    render = n_scenes * (COST_PER_SCENE + COST_PER_CELL * cells) * _pixels(top)
+    extra = n_scenes * COST_PER_RENDITION * sum(_pixels(h) for h in rest)
+    return COST_JOB_BASE + render + extra + audio_clips * COST_PER_AUDIO
+
+
+class Overloaded(RuntimeError):  # retryable: the job was never started here
+    def __init__(self, cost: float, free: float, retry_after: int):
+        super().__init__(f"OVERLOADED: job cost {cost:.0f} exceeds free capacity {max(free, 0):.0f}")
+        self.retry_after = retry_after
+
+
+class Admission:
+    """
+    Tracks estimated work committed to this node. A job is admitted while the
+    total stays within capacity; an idle node always admits, so one oversized
+    job can't be starved forever.
+    """
+    def __init__(self, capacity: float, workers: int):
+        self.capacity = capacity
+        self.workers = max(1, workers)
+        self.committed = 0.0
+        self.inflight = 0
+        self._lock = threading.Lock()
+
+    def admit(self, cost: float) -> "Ticket":
+        with self._lock:
+            free = self.capacity - self.committed
+            if self.inflight and cost > free:
+                # time until enough committed work drains, assuming all workers are busy
+                retry = math.ceil(min(600.0, max(5.0, (cost - free) / self.workers)))
+                raise Overloaded(cost, free, retry)
+            self.committed += cost
+            self.inflight += 1
+        return Ticket(self, cost)
+
+    def _release(self, cost: float):
+        with self._lock:
+            self.committed = max(0.0, self.committed - cost)
+            self.inflight = max(0, self.inflight - 1)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "capacity": self.capacity,
+                "committed": round(self.committed, 1),
+                "free": round(max(0.0, self.capacity - self.committed), 1),
+                "inflight": self.inflight,
+            }
+
+
+class Ticket:
+    def __init__(self, adm: Admission, cost: float):
+        self._adm, self.cost, self._open = adm, cost, True
+
+    def release(self):
+        if self._open:
+            self._open = False
+            self._adm._release(self.cost)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.release()
+
+
+admission = Admission(RENDER_CAPACITY, RENDER_WORKERS)
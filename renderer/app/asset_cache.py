@@ -0,0 +1,174 @@
+# renderer/app/asset_cache.py
+import hashlib, os, shutil, tempfile, time
+from pathlib import Path
+from typing import BinaryIO, Dict, List, Optional
+
+ASSET_CACHE_DIR    = os.getenv("ASSET_CACHE_DIR", "/tmp/pytomp4-assets")   # "" disables the cache
+ASSET_CACHE_MAX_MB = float(os.getenv("ASSET_CACHE_MAX_MB", "2048"))
+ASSET_CACHE_SCAN_SEC = float(os.getenv("ASSET_CACHE_SCAN_SEC", "60"))  # max age of a process's size estimate
+
+_CHUNK = 1 << 20
+
+
+def _name(prefix: str, s: str) -> str:
+    return f"{prefix}-{hashlib.sha256(s.encode()).hexdigest()}"
+
+def _norm_etag(etag: Optional[str]) -> Optional[str]:
+    if not etag:
+        return None
+    e = etag.strip()
+    if e.startswith("W/"):  # weak validators say nothing about the bytes
+        return None
+    return e.strip('"') or None
+
+
+class AssetCache:
+    """
+    Content-addressed store for downloaded assets, shared by all worker processes.
+
+    Layout (all names in one flat directory so they can be hard links to one inode):
+      c-<sha256(content)>   the blob
+      e-<sha256(etag)>      alias by ETag; R2 ETags are content MD5s, so identical
+                            TTS clips under different job keys share an entry
+    Only a strong ETag can produce a hit: an object key alone says nothing about
+    the bytes (regenerated TTS keeps its key), so responses without one are stored
+    but never served from the cache.
+
+    Entries are evicted least-recently-used once the store passes max_bytes. Each
+    process keeps a running size estimate (bytes it added since its last scan) and
+    only lists the directory when that passes max_bytes or is older than scan_sec,
+    so a store does not cost a scan of the whole cache.
+    """
+    def __init__(self, root: str, max_bytes: int, scan_sec: float = ASSET_CACHE_SCAN_SEC):
+        self.root = Path(root) if root else None
+        self.max_bytes = max_bytes
+        self.scan_sec = scan_sec
+        self._total: Optional[int] = None  # bytes at the last scan plus what this process stored since
+        self._entries = 0
+        self._scanned_at = 0.0
+        if self.root is not None:
+            try:
+                self.root.mkdir(parents=True, exist_ok=True)
+            except OSError as e:
+                print("WARN: asset cache disabled:", e)
+                self.root = None
+
+    @property
+    def enabled(self) -> bool:
+        return self.root is not None and self.max_bytes > 0
+
+    def lookup(self, key: str, etag: Optional[str]) -> Optional[Path]:
+        etag = _norm_etag(etag)
+        if not etag:
+            return None
+        p = self.root / _name("e", etag)
+        return p if p.exists() else None
+
+    def link_into(self, entry: Path, dest: Path) -> bool:
+        """Hard-link a cache entry into a job dir (copy across filesystems). False if it vanished."""
+        try:
+            if dest.exists():
+                dest.unlink()
+            try:
+                os.link(entry, dest)
+            except OSError:
+                shutil.copy2(entry, dest)
+            os.utime(entry)  # LRU clock: shared inode, so every alias is touched
+            return True
+        except FileNotFoundError:
+            return False
+
+    def _alias(self, blob: Path, name: str):
+        tmp = self.root / f".{name}.{os.getpid()}"
+        try:
+            os.link(blob, tmp)
+            os.replace(tmp, self.root / name)
+        except OSError:
+            try: tmp.unlink()
+            except OSError: pass
+
+    def store(self, src: BinaryIO, key: str, etag: Optional[str], dest: Path):
+        """Stream src into the cache, then link the result into dest."""
+        h = hashlib.sha256()
+        fd, tmp_name = tempfile.mkstemp(dir=self.root, prefix=".dl-")
+        tmp = Path(tmp_name)
+        try:
+            with os.fdopen(fd, "wb") as f:
+                while True:
+                    chunk = src.read(_CHUNK)
+                    if not chunk:
+                        break
+                    h.update(chunk)
+                    f.write(chunk)
+            if tmp.stat().st_size == 0:
+                raise FileNotFoundError(f"wrote zero bytes for {key}")
+            blob = self.root / f"c-{h.hexdigest()}"
+            added = 0
+            if blob.exists():
+                tmp.unlink()
+            else:
+                added = tmp.stat().st_size
+                os.replace(tmp, blob)
+        except BaseException:
+            try: tmp.unlink()
+            except OSError: pass
+            raise
+
+        etag = _norm_etag(etag)
+        if etag:
+            self._alias(blob, _name("e", etag))
+        if not self.link_into(blob, dest):
+            raise FileNotFoundError(f"cache entry for {key} evicted during store")
+        self._added(added)
+
+    def _stale(self) -> bool:
+        return self._total is None or time.monotonic() - self._scanned_at > self.scan_sec
+
+    def _added(self, nbytes: int):
+        if not self._stale():
+            self._total += nbytes
+            self._entries += 1 if nbytes else 0
+            if self._total <= self.max_bytes:
+                return
+        self.evict()
+
+    def evict(self):
+        """Scan the store, drop LRU entries until it fits, and refresh the size estimate."""
+        # group names by inode: an entry is the blob plus its aliases
+        entries: Dict[int, List] = {}
+        total = 0
+        for p in self.root.iterdir():
+            if p.name.startswith("."):
+                continue
+            try:
+                st = p.stat()
+            except FileNotFoundError:
+                continue
+            e = entries.get(st.st_ino)
+            if e is None:
+                entries[st.st_ino] = [st.st_mtime, st.st_size, [p]]
+                total += st.st_size
+            else:
+                e[2].append(p)
+        count = len(entries)
+        if total > self.max_bytes:
+            for mtime, size, paths in sorted(entries.values(), key=lambda e: e[0]):
+                for p in paths:
+                    try: p.unlink()
+                    except FileNotFoundError: pass
+                total -= size
+                count -= 1
+                if total <= self.max_bytes:
+                    break
+        self._total, self._entries, self._scanned_at = total, count, time.monotonic()
+
+    def stats(self) -> dict:
+        # estimate: other processes' stores since this process's last scan are not included
+        if not self.enabled:
+            return {"enabled": False}
+        if self._stale():
+            self.evict()
+        return {"enabled": True, "entries": self._entries, "bytes": self._total, "maxBytes": self.max_bytes}
+
+
+asset_cache = AssetCache(ASSET_CACHE_DIR, int(ASSET_CACHE_MAX_MB * 1024 * 1024))
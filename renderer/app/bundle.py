@@ -0,0 +1,111 @@
+# renderer/app/bundle.py
+import json, mmap, struct, tarfile, zipfile
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+AUDIO_EXTS = (".wav", ".mp3", ".m4a", ".aac", ".ogg", ".flac")
+
+# ffmpeg inputs for bundle members are subfile: URLs; concat lists need the protocol allowed
+FFMPEG_WHITELIST = ["-protocol_whitelist", "file,subfile,crypto,data"]
+
+
+def ffmpeg_path(p: Path | str) -> str:
+    """A media input as ffmpeg takes it: files by path, bundle members as their subfile URL (str)."""
+    return p.as_posix() if isinstance(p, Path) else p
+
+
+class BundleError(ValueError):
+    pass
+
+
+def _norm(name: str) -> str:
+    return name[2:] if name.startswith("./") else name
+
+
+class Bundle:
+    """
+    A job bundle: one uncompressed tar, or a zip with stored (uncompressed) members,
+    holding events.json, narration.json, complexity.json, sync.json and audio/*.
+    An optional index.json names the members explicitly:
+        {"events": "events.json", "sync": "sync.json", "audio": ["audio/000.wav", ...]}
+
+    Members are never extracted: JSON is sliced out of an mmap of the bundle, and
+    audio is handed to ffmpeg as a byte range of the bundle file (subfile protocol).
+    """
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self.members: Dict[str, Tuple[int, int]] = {}  # name -> (offset, size)
+        self._f = open(self.path, "rb")
+        try:
+            self._mm = mmap.mmap(self._f.fileno(), 0, access=mmap.ACCESS_READ)
+        except (ValueError, OSError) as e:  # empty file
+            self._f.close()
+            raise BundleError(f"bundle is empty or unreadable: {e}")
+        try:
+            if zipfile.is_zipfile(self.path):
+                self._scan_zip()
+            else:
+                self._scan_tar()
+            self.index = json.loads(self.read("index.json")) if "index.json" in self.members else {}
+        except BaseException:
+            self.close()
+            raise
+
+    def _scan_tar(self):
+        try:
+            # "r:" refuses compressed tars: their members have no byte range in the file
+            with tarfile.open(self.path, mode="r:") as tf:
+                for m in tf:
+                    if m.isreg():
+                        self.members[_norm(m.name)] = (m.offset_data, m.size)
+        except tarfile.TarError as e:
+            raise BundleError(f"bundle is neither an uncompressed tar nor a zip: {e}")
+
+    def _scan_zip(self):
+        with zipfile.ZipFile(self.path) as zf:
+            for info in zf.infolist():
+                if info.is_dir():
+                    continue
+                if info.compress_type != zipfile.ZIP_STORED:
+                    raise BundleError(f"bundle member {info.filename} is compressed; store members uncompressed")
+                # data starts after the local header, whose name/extra lengths can differ from the central directory
+                hdr = self._mm[info.header_offset:info.header_offset + 30]
+                n_name, n_extra = struct.unpack("<HH", hdr[26:30])
+                off = info.header_offset + 30 + n_name + n_extra
+                self.members[_norm(info.filename)] = (off, info.file_size)
+
+    def read(self, name: str) -> bytes:
+        off, size = self.members[name]
+        return self._mm[off:off + size]
+
+    def copy_member(self, name: str, dest: Path):
+        off, size = self.members[name]
+        with open(dest, "wb") as f:
+            f.write(self._mm[off:off + size])
+
+    def ffmpeg_input(self, name: str) -> str:
+        off, size = self.members[name]
+        return f"subfile,,start,{off},end,{off + size},,:{self.path.as_posix()}"
+
+    def find(self, kind: str) -> Optional[str]:
+        name = self.index.get(kind) or f"{kind}.json"
+        return name if name in self.members else None
+
+    def audio_members(self) -> List[str]:
+        names = self.index.get("audio")
+        if names:
+            missing = [n for n in names if n not in self.members]
+            if missing:
+                raise BundleError(f"index.json lists missing audio members: {missing[:3]}")
+            return list(names)
+        return sorted(n for n in self.members if n.startswith("audio/") and n.lower().endswith(AUDIO_EXTS))
+
+    def close(self):
+        self._mm.close()
+        self._f.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
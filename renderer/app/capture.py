@@ -0,0 +1,118 @@
+# renderer/app/capture.py
+"""
+Job capture for offline replay (see `python -m app.cli replay`).
+
+A capture is an uncompressed tar laid out like a job dir (and like a job bundle):
+
+    events.json  sync.json  narration.json  complexity.json  audio/000.mp3 ...
+                                                inputs exactly as the renderer saw them
+    payload.json                                the /render payload, signatures and upload URLs stripped
+    capture.json                                outcome, settings, per-stage and per-scene timings
+
+Inputs are staged in the worker right after the fetch (hard links where possible),
+so a job killed by its deadline can still be captured.
+"""
+import json, os, re, shutil, tarfile, time
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+from urllib.parse import urlparse, urlunparse
+
+from .bundle import Bundle
+
+CAPTURE_DIR      = Path(os.getenv("CAPTURE_DIR", "/tmp/pytomp4-captures"))
+CAPTURE_SLOW_SEC = float(os.getenv("CAPTURE_SLOW_SEC", "0"))  # also capture any job slower than this (0 = only on request)
+
+STAGING = "capture"
+
+
+def wants_staging(requested: bool) -> bool:
+    return requested or CAPTURE_SLOW_SEC > 0
+
+def should_capture(requested: bool, seconds: Optional[float]) -> bool:
+    if requested:
+        return True
+    return CAPTURE_SLOW_SEC > 0 and (seconds is None or seconds >= CAPTURE_SLOW_SEC)
+
+
+def _place(src: Path, dest: Path):
+    try:
+        os.link(src, dest)
+    except OSError:
+        shutil.copyfile(src, dest)
+
+def stage_inputs(td: Path, events, sync, audio_files: List[Path | str], bundle: Optional[Path] = None,
+                 extra: Optional[Dict[str, Any]] = None) -> Path:
+    """
+    Copy the fetched inputs into td/capture as a job dir. events/sync, and the
+    values of `extra` ({"narration": ..., "complexity": ...}), are paths or bytes
+    (bundle members). With `bundle`, audio_files are its subfile inputs and the
+    audio members are copied out of the bundle under their own names.
+    """
+    out = td / STAGING
+    (out / "audio").mkdir(parents=True, exist_ok=True)
+    inputs = {"events.json": events, "sync.json": sync, **{f"{k}.json": v for k, v in (extra or {}).items()}}
+    for name, src in inputs.items():
+        if isinstance(src, (bytes, bytearray)):
+            (out / name).write_bytes(src)
+        elif src is not None and Path(src).exists():
+            _place(Path(src), out / name)
+    if bundle is not None:
+        with Bundle(bundle) as b:
+            for i, name in enumerate(b.audio_members()):
+                b.copy_member(name, out / "audio" / f"{i:03d}{Path(name).suffix or '.mp3'}")
+    else:
+        for i, a in enumerate(audio_files):
+            a = Path(a)
+            _place(a, out / "audio" / f"{i:03d}{a.suffix or '.mp3'}")
+    return out
+
+
+def _redact(obj: Any) -> Any:
+    # signed URLs: keep scheme/host/path for context, drop the query carrying the signature
+    if isinstance(obj, dict):
+        return {k: _redact(v) for k, v in obj.items()}
+    if isinstance(obj, list):
+        return [_redact(v) for v in obj]
+    if isinstance(obj, str) and obj.startswith(("http://", "https://")):
+        return urlunparse(urlparse(obj)._replace(query="", fragment=""))
+    return obj
+
+def redact_payload(payload: Dict[str, Any]) -> Dict[str, Any]:
+    out = _redact({k: v for k, v in payload.items() if k != "stream"})
+    out["stream"] = {"redacted": True}  # upload URLs are bearer credentials
+    return out
+
+
+def write_archive(td: Path, job_id: str, payload: Dict[str, Any], info: Dict[str, Any]) -> Optional[Path]:
+    """Tar td/capture plus payload.json/capture.json into CAPTURE_DIR. Returns the archive path."""
+    staged = td / STAGING
+    if not (staged / "events.json").exists():
+        print(f"WARN: capture skipped for {job_id}: inputs were never staged")
+        return None
+    (staged / "payload.json").write_text(json.dumps(redact_payload(payload), indent=2), encoding="utf-8")
+    (staged / "capture.json").write_text(json.dumps({"jobId": job_id, "capturedAt": time.time(), **info},
+                                                    indent=2), encoding="utf-8")
+    CAPTURE_DIR.mkdir(parents=True, exist_ok=True)
+    safe = re.sub(r"[^\w.-]", "_", job_id)[:80] or "job"
+    dest = CAPTURE_DIR / f"{safe}-{time.strftime('%Y%m%dT%H%M%SZ', time.gmtime())}.tar"
+    part = dest.with_suffix(".tar.part")
+    # uncompressed: audio is already compressed, and the archive stays a valid job bundle
+    with tarfile.open(part, "w:") as tf:
+        for p in sorted(staged.rglob("*")):
+            if p.is_file():
+                tf.add(p, arcname=p.relative_to(staged).as_posix())
+    os.replace(part, dest)
+    return dest
+
+def read_info(archive: Path) -> Dict[str, Any]:
+    with tarfile.open(archive, "r:") as tf:
+        f = tf.extractfile("capture.json")
+        return json.loads(f.read()) if f else {}
+
+def extract(archive: Path, dest: Path) -> Path:
+    dest.mkdir(parents=True, exist_ok=True)
+    with tarfile.open(archive, "r:") as tf:
+        members = [m for m in tf.getmembers()
+                   if m.isreg() and not m.name.startswith("/") and ".." not in Path(m.name).parts]
+        tf.extractall(dest, members=members)
+    return dest
@@ -0,0 +1,241 @@
+# renderer/app/cli.py
+"""
+Offline renderer for stored jobs (backfills after template changes).
+
+    python -m app.cli render JOB_DIR [JOB_DIR ...] --out /output [-j 4] [--resume]
+    python -m app.cli replay CAPTURE.tar|CORPUS_DIR ... [--runs 3] [--tolerance 0.25]
+
+A job dir holds events.json, optional sync.json and audio/* (sorted by name).
+A dir without events.json is treated as a root and its subdirs are rendered.
+
+replay renders captured production jobs (see capture.py) offline and compares
+render time against the timings recorded at capture. Baselines are only
+comparable on the same node type the capture came from.
+"""
+import argparse, json, os, shutil, statistics, sys, tempfile, time, traceback
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from .manim_render import render_manim, RENDER_HEIGHT
+from .encoding import ENCODE_PRESET, ENCODE_PROFILES
+from . import capture
+
+AUDIO_EXTS = {".wav", ".mp3", ".m4a", ".aac", ".ogg", ".flac"}
+
+
+def find_jobs(paths: List[str]) -> List[Path]:
+    jobs: List[Path] = []
+    for p in map(Path, paths):
+        if (p / "events.json").exists():
+            jobs.append(p)
+        elif p.is_dir():
+            jobs.extend(sorted(d for d in p.iterdir() if (d / "events.json").exists()))
+        else:
+            print(f"WARN: not a job dir: {p}", file=sys.stderr)
+    return jobs
+
+def job_audio(job_dir: Path) -> List[Path]:
+    adir = job_dir / "audio"
+    return sorted(p for p in adir.iterdir() if p.suffix.lower() in AUDIO_EXTS) if adir.is_dir() else []
+
+def render_job_dir(job_dir: str, out_mp4: str, height: int = RENDER_HEIGHT,
+                   segment_sec: Optional[float] = None, max_kbps: Optional[int] = None) -> dict:
+    """Render one job dir to out_mp4 (atomically). Runs in a pool process."""
+    jd, out = Path(job_dir), Path(out_mp4)
+    t0 = time.monotonic()
+    audio = job_audio(jd)
+    if not audio:
+        raise RuntimeError("no audio files")
+    sync = jd / "sync.json"
+    with tempfile.TemporaryDirectory() as td:
+        tmp_out = Path(td) / "out.mp4"
+        scenes = render_manim(jd / "events.json", audio, tmp_out, sync_json=sync if sync.exists() else None,
+                              segment_sec=segment_sec, height=height, max_kbps=max_kbps)
+        out.parent.mkdir(parents=True, exist_ok=True)
+        part = out.with_suffix(".mp4.part")
+        shutil.copyfile(tmp_out, part)
+        os.replace(part, out)  # a finished output is what --resume looks for
+    return {
+        "seconds": time.monotonic() - t0,
+        "videoSeconds": sum(float(s.get("duration") or 0) for s in scenes or []),
+        "scenes": len(scenes or []),
+        "sceneInfo": scenes or [],
+    }
+
+
+def cmd_render(args) -> int:
+    jobs = find_jobs(args.jobs_dirs)
+    out_dir = Path(args.out)
+    todo, skipped = [], 0
+    for jd in jobs:
+        out = out_dir / f"{jd.name}.mp4"
+        if args.resume and out.exists() and out.stat().st_size > 0:
+            skipped += 1
+            continue
+        todo.append((jd, out))
+
+    print(f"jobs={len(jobs)} todo={len(todo)} skipped={skipped} procs={args.procs}")
+    t0 = time.monotonic()
+    done, failed, video_sec, render_sec = 0, [], 0.0, 0.0
+    # fresh interpreter every few jobs: Manim/cairo memory only grows
+    with ProcessPoolExecutor(max_workers=args.procs, max_tasks_per_child=args.max_tasks or None) as ex:
+        futs = {ex.submit(render_job_dir, str(jd), str(out)): jd for jd, out in todo}
+        for fut in as_completed(futs):
+            jd = futs[fut]
+            try:
+                r = fut.result()
+                done += 1
+                video_sec += r["videoSeconds"]; render_sec += r["seconds"]
+                print(f"OK   {jd.name} scenes={r['scenes']} video={r['videoSeconds']:.1f}s took={r['seconds']:.1f}s")
+            except Exception as e:
+                failed.append(jd.name)
+                print(f"FAIL {jd.name}: {e}", file=sys.stderr)
+                if args.verbose:
+                    traceback.print_exc()
+
+    wall = time.monotonic() - t0
+    summary = {
+        "jobs": len(jobs), "rendered": done, "skipped": skipped, "failed": len(failed),
+        "wallSeconds": round(wall, 1),
+        "jobsPerMinute": round(done / wall * 60, 2) if wall > 0 else 0.0,
+        "videoSeconds": round(video_sec, 1),
+        "realtimeFactor": round(video_sec / wall, 2) if wall > 0 else 0.0,
+        "meanJobSeconds": round(render_sec / done, 1) if done else 0.0,
+        "failedJobs": failed,
+    }
+    print(json.dumps(summary, indent=2))
+    if args.summary:
+        Path(args.summary).write_text(json.dumps(summary, indent=2), encoding="utf-8")
+    return 1 if failed else 0
+
+
+def find_captures(paths: List[str]) -> List[Path]:
+    out: List[Path] = []
+    for p in map(Path, paths):
+        if p.is_file() and p.suffix == ".tar":
+            out.append(p)
+        elif p.is_dir():
+            out.extend(sorted(p.rglob("*.tar")))
+        else:
+            print(f"WARN: not a capture: {p}", file=sys.stderr)
+    return out
+
+def _setting_drift(settings: Dict[str, Any]) -> List[str]:
+    # knobs that change render time; a mismatch makes the comparison meaningless
+    now = {
+        "useManim": os.getenv("USE_MANIM", "1") == "1",
+        "paceMult": float(os.getenv("PACE_MULT", "1.0")),
+        "rasterTemplates": os.getenv("RASTER_TEMPLATES"),
+        "encodePreset": ENCODE_PRESET,
+        "crfStill": ENCODE_PROFILES["still"]["crf"],
+        "crfAnimation": ENCODE_PROFILES["animation"]["crf"],
+    }
+    return [f"{k}: captured={settings[k]!r} now={v!r}" for k, v in now.items() if k in settings and settings[k] != v]
+
+def replay_one(archive: Path, runs: int, tolerance: float, ex: ProcessPoolExecutor) -> Dict[str, Any]:
+    info = capture.read_info(archive)
+    settings = info.get("settings") or {}
+    height = (settings.get("ladder") or [RENDER_HEIGHT])[0]
+    seg = settings.get("segmentSec") if settings.get("output") == "hls" else None
+    max_kbps = info.get("maxKbps")  # the job's bitrate cap, as its worker computed it
+    times: List[float] = []
+    scene_runs: List[List[Dict[str, Any]]] = []
+    with tempfile.TemporaryDirectory() as td:
+        jd = capture.extract(archive, Path(td) / "job")
+        for _ in range(runs):
+            r = ex.submit(render_job_dir, str(jd), str(Path(td) / "out.mp4"), height, seg, max_kbps).result()
+            times.append(r["seconds"])
+            scene_runs.append(r["sceneInfo"])
+
+    replay = statistics.median(times)
+    base = (info.get("timings") or {}).get("render")
+    res: Dict[str, Any] = {
+        "capture": archive.name, "jobId": info.get("jobId"), "outcome": info.get("outcome"),
+        "baselineSec": base, "replaySec": round(replay, 2), "runs": [round(t, 2) for t in times],
+    }
+    if not base:
+        res["status"] = "no-baseline"  # e.g. killed at its deadline before the render stage finished
+    else:
+        ratio = replay / base
+        res["ratio"] = round(ratio, 2)
+        res["status"] = "regressed" if ratio > 1 + tolerance else "improved" if ratio < 1 - tolerance else "ok"
+
+    # scenes that moved the most, by median replay time against the captured per-scene time
+    base_scenes = {s["index"]: s.get("seconds") for s in info.get("scenes") or [] if "index" in s}
+    deltas = []
+    for k, sc in enumerate(scene_runs[0]):
+        b = base_scenes.get(sc["index"])
+        if b is None:
+            continue
+        now = statistics.median(run[k].get("seconds") or 0.0 for run in scene_runs)
+        deltas.append({"index": sc["index"], "type": sc.get("type"), "baselineSec": b, "replaySec": round(now, 2)})
+    deltas.sort(key=lambda d: d["replaySec"] - d["baselineSec"], reverse=True)
+    res["topScenes"] = deltas[:3]
+
+    drift = _setting_drift(settings)
+    if settings.get("peers"):
+        drift.append(f"captured on a coordinator with {settings['peers']} peers; replay renders locally")
+    if settings.get("target") and max_kbps is None:
+        drift.append("captured with a size/bitrate target but no cap recorded; replay encodes uncapped")
+    if drift:
+        res["warnings"] = drift
+    return res
+
+def cmd_replay(args) -> int:
+    archives = find_captures(args.captures)
+    print(f"captures={len(archives)} runs={args.runs} tolerance={args.tolerance}")
+    results, failed = [], []
+    # one job at a time in a fresh process per run, so timings aren't skewed by neighbours or warm state
+    with ProcessPoolExecutor(max_workers=1, max_tasks_per_child=1) as ex:
+        for a in archives:
+            try:
+                r = replay_one(a, args.runs, args.tolerance, ex)
+                results.append(r)
+                ratio = f" x{r['ratio']:.2f}" if "ratio" in r else ""
+                print(f"{r['status'].upper():11s} {a.name} baseline={r['baselineSec']} replay={r['replaySec']}s{ratio}")
+                for w in r.get("warnings", []):
+                    print(f"  WARN: {w}")
+            except Exception as e:
+                failed.append(a.name)
+                print(f"FAIL {a.name}: {e}", file=sys.stderr)
+                if args.verbose:
+                    traceback.print_exc()
+
+    regressed = [r["capture"] for r in results if r["status"] == "regressed"]
+    summary = {"captures": len(archives), "replayed": len(results), "failed": failed,
+               "regressed": regressed, "results": results}
+    print(json.dumps(summary, indent=2))
+    if args.summary:
+        Path(args.summary).write_text(json.dumps(summary, indent=2), encoding="utf-8")
+    return 1 if failed or regressed else 0
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    ap = argparse.ArgumentParser(prog="python -m app.cli")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+
+    r = sub.add_parser("render", help="render local job dirs with a process pool")
+    r.add_argument("jobs_dirs", nargs="+", help="job dirs, or roots containing job dirs")
+    r.add_argument("--out", default=os.getenv("LOCAL_OUTPUT_DIR", "/output"))
+    r.add_argument("-j", "--procs", type=int, default=os.cpu_count() or 1)
+    r.add_argument("--max-tasks", type=int, default=10, help="recycle a pool process after N jobs (0 = never)")
+    r.add_argument("--resume", action="store_true", help="skip jobs whose output already exists")
+    r.add_argument("--summary", help="also write the throughput summary JSON here")
+    r.add_argument("-v", "--verbose", action="store_true")
+    r.set_defaults(func=cmd_render)
+
+    p = sub.add_parser("replay", help="re-render captured jobs offline and compare with their recorded timings")
+    p.add_argument("captures", nargs="+", help="capture archives, or dirs searched for *.tar")
+    p.add_argument("--runs", type=int, default=1, help="renders per capture; the median is compared")
+    p.add_argument("--tolerance", type=float, default=0.25, help="relative slowdown reported as a regression")
+    p.add_argument("--summary", help="also write the comparison JSON here")
+    p.add_argument("-v", "--verbose", action="store_true")
+    p.set_defaults(func=cmd_replay)
+
+    args = ap.parse_args(argv)
+    return args.func(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
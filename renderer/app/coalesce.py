@@ -0,0 +1,74 @@
+# renderer/app/coalesce.py
+import threading, time
+from typing import Any, Callable, Dict, Optional, Tuple
+
+
+class _Flight:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result: Any = None
+        self.error: Optional[BaseException] = None
+        self.followers = 0
+
+
+class Coalescer:
+    """
+    Single-flight by key: concurrent callers with the same key share one execution,
+    and a successful result is replayed to later callers for `ttl` seconds.
+    Failures are never cached, so a retry after a failure renders again.
+    """
+    def __init__(self, ttl: float):
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._inflight: Dict[str, _Flight] = {}
+        self._recent: Dict[str, Tuple[float, Any]] = {}
+
+    def _purge(self, now: float):
+        for k in [k for k, (exp, _) in self._recent.items() if exp <= now]:
+            del self._recent[k]
+
+    def run(self, key: str, fn: Callable[[], Any]) -> Tuple[Any, str]:
+        """
+        Returns (result, how) where how is "leader", "attached" (joined a running
+        call) or "cached" (recently completed duplicate).
+        """
+        with self._lock:
+            now = time.monotonic()
+            self._purge(now)
+            hit = self._recent.get(key)
+            if hit is not None:
+                return hit[1], "cached"
+            fl = self._inflight.get(key)
+            leader = fl is None
+            if leader:
+                fl = self._inflight[key] = _Flight()
+            else:
+                fl.followers += 1
+
+        if not leader:
+            fl.done.wait()
+            if fl.error is not None:
+                raise fl.error
+            return fl.result, "attached"
+
+        try:
+            fl.result = fn()
+            if self.ttl > 0:
+                with self._lock:
+                    self._recent[key] = (time.monotonic() + self.ttl, fl.result)
+            return fl.result, "leader"
+        except BaseException as e:
+            fl.error = e
+            raise
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+            fl.done.set()
+
+    def forget(self, key: str):
+        with self._lock:
+            self._recent.pop(key, None)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"inflight": len(self._inflight), "recent": len(self._recent)}
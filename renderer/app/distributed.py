@@ -0,0 +1,139 @@
+# renderer/app/distributed.py
+import json, math, os, threading, time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+import requests
+
+from .manim_render import render_manim, _concat, RENDER_HEIGHT
+from .encoding import stream_signature
+
+# Coordinator mode: set RENDER_PEERS on the instance that receives /render.
+# Peers are plain renderer instances (same RENDER_TOKEN) serving POST /render/scenes.
+RENDER_PEERS          = [p.strip().rstrip("/") for p in os.getenv("RENDER_PEERS", "").split(",") if p.strip()]
+DISTRIBUTE_MIN_SCENES = int(os.getenv("DISTRIBUTE_MIN_SCENES", "24"))
+SCENES_PER_RANGE      = int(os.getenv("SCENES_PER_RANGE", "0"))        # 0 = ~2 ranges per peer
+PEER_SLOTS            = int(os.getenv("PEER_SLOTS", "1"))              # concurrent ranges per peer
+PEER_TIMEOUT_SEC      = float(os.getenv("PEER_TIMEOUT_SEC", "900"))
+RENDER_TOKEN          = os.getenv("RENDER_TOKEN", "dev-render-token")
+
+
+def should_distribute(n_scenes: int) -> bool:
+    return bool(RENDER_PEERS) and n_scenes >= DISTRIBUTE_MIN_SCENES
+
+def split_ranges(n: int, parts: int) -> List[Tuple[int, int]]:
+    """Contiguous [start, end) ranges covering 0..n, sizes differing by at most one."""
+    parts = max(1, min(n, parts))
+    base, extra = divmod(n, parts)
+    out, s = [], 0
+    for k in range(parts):
+        e = s + base + (1 if k < extra else 0)
+        out.append((s, e))
+        s = e
+    return out
+
+def cancel_on_peers(job_id: str):
+    """Best effort: stop this job's ranges on every peer."""
+    for peer in RENDER_PEERS:
+        try:
+            requests.delete(f"{peer}/render/{job_id}", timeout=5,
+                            headers={"Authorization": f"Bearer {RENDER_TOKEN}"})
+        except requests.RequestException:
+            pass
+
+
+_local_lock = threading.Lock()
+
+
+class _PeerSet:
+    # round-robin over peers, skipping the ones that already failed this job
+    def __init__(self, peers: List[str]):
+        self.peers = list(peers)
+        self.bad: set = set()
+        self._next = 0
+        self._lock = threading.Lock()
+
+    def pick(self, tried: set) -> Optional[str]:
+        with self._lock:
+            for _ in range(len(self.peers)):
+                p = self.peers[self._next % len(self.peers)]
+                self._next += 1
+                if p not in self.bad and p not in tried:
+                    return p
+            return None
+
+    def fail(self, peer: str):
+        with self._lock:
+            self.bad.add(peer)
+
+
+def _render_on_peer(peer: str, job_id: str, assets: Dict[str, Any], rng: Tuple[int, int],
+                    out: Path, deadline: Optional[float], height: int,
+                    segment_sec: Optional[float], max_kbps: Optional[int]) -> List[Dict[str, Any]]:
+    body = {"jobId": job_id, "assets": assets, "start": rng[0], "end": rng[1], "height": height,
+            "segmentSec": segment_sec, "maxKbps": max_kbps, "encodeSignature": stream_signature()}
+    timeout = PEER_TIMEOUT_SEC
+    if deadline is not None:
+        timeout = max(5.0, min(timeout, deadline - time.monotonic()))
+        body["deadlineSec"] = timeout
+    with requests.post(f"{peer}/render/scenes", json=body, stream=True, timeout=timeout,
+                       headers={"Authorization": f"Bearer {RENDER_TOKEN}"}) as r:
+        if r.status_code != 200:
+            raise RuntimeError(f"peer {peer} returned {r.status_code}: {r.text[:200]}")
+        scenes = json.loads(r.headers.get("X-Scenes") or "[]")
+        with open(out, "wb") as f:
+            for chunk in r.iter_content(1 << 20):
+                f.write(chunk)
+    if out.stat().st_size == 0:
+        raise RuntimeError(f"peer {peer} sent an empty clip")
+    return scenes
+
+
+def render_distributed(job_id: str, assets: Dict[str, Any], events_json: Path | bytes, audio_files: List[Path | str],
+                       out_mp4: Path, n_scenes: int, sync_json: Path | None = None,
+                       segment_sec: float | None = None, deadline: Optional[float] = None,
+                       height: int = RENDER_HEIGHT, max_kbps: Optional[int] = None) -> List[Dict[str, Any]]:
+    """
+    Coordinator: split the timeline into scene ranges, render each on a peer
+    (peers fetch the same signed assets), then concatenate the range clips.
+    Peers encode with the same profiles and HLS keyframes, so the join is a stream copy.
+    A range whose peer fails goes to the next healthy peer; if none is left it
+    is rendered here. Returns the same per-scene info as render_manim.
+    """
+    peers = _PeerSet(RENDER_PEERS)
+    per = SCENES_PER_RANGE or math.ceil(n_scenes / (2 * len(RENDER_PEERS)))
+    ranges = split_ranges(n_scenes, math.ceil(n_scenes / max(1, per)))
+    print(f"DISTRIBUTE: job={job_id} scenes={n_scenes} ranges={len(ranges)} peers={len(RENDER_PEERS)}")
+
+    def one(rng: Tuple[int, int]) -> Tuple[Path, List[Dict[str, Any]]]:
+        out = out_mp4.parent / f"range_{rng[0]:03d}_{rng[1]:03d}.mp4"
+        tried: set = set()
+        while True:
+            peer = peers.pick(tried)
+            if peer is None:
+                break
+            tried.add(peer)
+            t0 = time.monotonic()
+            try:
+                scenes = _render_on_peer(peer, job_id, assets, rng, out, deadline, height, segment_sec, max_kbps)
+                print(f"DISTRIBUTE: range {rng} on {peer} took {time.monotonic() - t0:.1f}s")
+                return out, scenes
+            except Exception as e:
+                print(f"WARN: range {rng} failed on {peer}: {e}")
+                peers.fail(peer)
+        print(f"WARN: no healthy peer for range {rng}; rendering locally")
+        local_dir = out_mp4.parent / f"local_{rng[0]:03d}"
+        local_dir.mkdir(exist_ok=True)
+        with _local_lock:  # Manim's config is process-global
+            scenes = render_manim(events_json, audio_files, local_dir / "out.mp4", sync_json=sync_json,
+                                  segment_sec=segment_sec, scene_range=rng, height=height, max_kbps=max_kbps)
+        return local_dir / "out.mp4", scenes
+
+    with ThreadPoolExecutor(max_workers=len(RENDER_PEERS) * PEER_SLOTS) as ex:
+        results = list(ex.map(one, ranges))
+
+    clips = [clip for clip, _ in results]
+    scenes = [sc for _, scs in results for sc in scs]
+    _concat(clips, out_mp4)
+    return scenes
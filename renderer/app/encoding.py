@@ -0,0 +1,132 @@
+# renderer/app/encoding.py
+import hashlib, json, os, re, subprocess, sys, tempfile
+from pathlib import Path
+from typing import Dict, List, Optional
+
+FPS = 30
+ENCODE_PRESET = os.getenv("ENCODE_PRESET", "medium")
+AUDIO_KBPS    = int(os.getenv("AUDIO_KBPS", "128"))
+
+# Scene clips are concatenated with -c copy, so every profile must produce the same
+# SPS/PPS (the mp4 avcC holds only the first clip's). Pinned here: refs/bframes via
+# -refs/-bf (tunes override them inside -x264-params), and stitchable=1 so x264 does
+# not derive pic_init_qp from the CRF. Each profile's "x264" params restore the PPS
+# chroma QP offset its tune's psy settings move. Check with `python -m app.encoding`.
+X264_REFS, X264_BFRAMES = 3, 3
+X264_COMMON = "repeat-headers=1:stitchable=1"
+
+# Scenes are encoded once, at the top rendition, with the profile of their template.
+ENCODE_PROFILES: Dict[str, Dict] = {
+    # text cards: nothing moves after the opening fades
+    # (stillimage's psy-trellis lowers the chroma QP offset by 2 more than animation's psy-rd)
+    "still":     {"tune": "stillimage", "crf": int(os.getenv("CRF_STILL", "30")), "gop_sec": 10.0,
+                  "x264": "chroma-qp-offset=2"},
+    # pointer/tape motion over flat colours and hard edges
+    "animation": {"tune": "animation", "crf": int(os.getenv("CRF_ANIMATION", "24")), "gop_sec": 4.0,
+                  "x264": ""},
+}
+
+TEMPLATE_PROFILES: Dict[str, str] = {
+    "title_card": "still",
+    "callout": "still",
+    "result_card": "still",
+    "complexity_card": "still",
+    "array_tape": "animation",
+    "move_pointer": "animation",
+}
+
+
+def profile_for(scene_type: Optional[str]) -> str:
+    return TEMPLATE_PROFILES.get(scene_type or "", "animation")
+
+def video_args(profile: str, keyframe_sec: Optional[float] = None, max_kbps: Optional[int] = None) -> List[str]:
+    """
+    libx264 output args for one scene clip. keyframe_sec forces a keyframe every
+    keyframe_sec from the clip start (HLS cut points, see hls.cut_times);
+    max_kbps caps the CRF encode with a VBV buffer.
+    """
+    p = ENCODE_PROFILES.get(profile, ENCODE_PROFILES["animation"])
+    x264 = ":".join(filter(None, [X264_COMMON, p["x264"]]))
+    args = ["-c:v", "libx264", "-preset", ENCODE_PRESET, "-tune", p["tune"], "-crf", str(p["crf"]),
+            "-g", str(int(p["gop_sec"] * FPS)), "-refs", str(X264_REFS), "-bf", str(X264_BFRAMES),
+            "-x264-params", x264, "-pix_fmt", "yuv420p"]
+    if keyframe_sec:
+        args += ["-force_key_frames", f"expr:gte(t,n_forced*{keyframe_sec:g})"]
+    if max_kbps:
+        args += ["-maxrate", f"{max_kbps}k", "-bufsize", f"{2 * max_kbps}k"]
+    return args
+
+def dominant_profile(scenes: List[Dict]) -> str:
+    """Profile covering most of the runtime, for whole-video encodes (lower renditions)."""
+    seconds: Dict[str, float] = {}
+    for sc in scenes:
+        p = sc.get("profile") or "animation"
+        seconds[p] = seconds.get(p, 0.0) + float(sc.get("duration") or 0)
+    return max(seconds, key=seconds.get) if seconds else "animation"
+
+def scaled_kbps(max_kbps: Optional[int], height: int, top: int) -> Optional[int]:
+    # a lower rendition's share of the cap, by pixel count
+    return max(100, int(max_kbps * (height / top) ** 2)) if max_kbps else None
+
+def budget_kbps(video_kbps: Optional[int], max_mb: Optional[float], seconds: float) -> Optional[int]:
+    """Video bitrate cap for a job: the explicit cap, or what fits max_mb after audio (5% container headroom)."""
+    caps = [video_kbps] if video_kbps else []
+    if max_mb and seconds > 0:
+        fit = max_mb * 8e3 * 0.95 / seconds - AUDIO_KBPS
+        caps.append(max(100, int(fit)))
+    return min(caps) if caps else None
+
+
+def stream_signature() -> str:
+    """
+    Digest of the settings that shape SPS/PPS. Clips from renderers with different
+    signatures can't be stream-copied together (CRF is excluded: stitchable=1).
+    """
+    shape = {"preset": ENCODE_PRESET, "refs": X264_REFS, "bframes": X264_BFRAMES, "x264": X264_COMMON,
+             "profiles": {k: [p["tune"], p["x264"]] for k, p in sorted(ENCODE_PROFILES.items())}}
+    return hashlib.sha256(json.dumps(shape, sort_keys=True).encode()).hexdigest()[:16]
+
+
+def parameter_sets(mp4: Path) -> List[str]:
+    """SPS/PPS syntax elements of the mp4's avcC (extradata), as ffmpeg's trace_headers prints them."""
+    r = subprocess.run(["ffmpeg", "-v", "trace", "-i", str(mp4), "-c", "copy", "-bsf:v", "trace_headers",
+                        "-frames:v", "1", "-f", "null", "-"], capture_output=True, text=True)
+    out, keep = [], False
+    for line in r.stderr.splitlines():
+        m = re.search(r"\[trace_headers[^\]]*\]\s+(?:\d+\s+)?(.*)", line)
+        if not m:
+            continue
+        text = m.group(1).strip()
+        if text == "Extradata":
+            keep = True
+        elif text.startswith("Packet:"):
+            break
+        elif keep and "=" in text:
+            out.append(f"{text.split()[0]}={text.rsplit('=', 1)[1].strip()}")
+    return out
+
+def check_profiles(height: int = 360) -> int:
+    """Encode a short clip per profile (with and without a bitrate cap) and compare SPS/PPS."""
+    w = (round(height * 16 / 9) // 2) * 2
+    sets: Dict[str, List[str]] = {}
+    with tempfile.TemporaryDirectory() as td:
+        for name in ENCODE_PROFILES:
+            for kbps in (None, 800):
+                out = Path(td) / f"{name}_{kbps}.mp4"
+                subprocess.run(["ffmpeg", "-y", "-v", "error", "-f", "lavfi", "-i", f"testsrc2=s={w}x{height}:r={FPS}",
+                                "-t", "2", *video_args(name, 1.0, kbps), "-an", str(out)], check=True)
+                sets[out.stem] = parameter_sets(out)
+    ref_name, ref = next(iter(sets.items()))
+    bad = 0
+    for name, ps in sets.items():
+        diff = sorted(set(ps) ^ set(ref))
+        if not ps or diff:
+            bad += 1
+            print(f"MISMATCH {name} vs {ref_name}: {diff[:6] or 'no parameter sets found'}")
+    print(json.dumps({"signature": stream_signature(), "clips": len(sets), "mismatched": bad,
+                      "elements": len(ref)}))
+    return 1 if bad else 0
+
+
+if __name__ == "__main__":
+    sys.exit(check_profiles())
@@ -0,0 +1,81 @@
+# renderer/app/hls.py
+import json, os, subprocess
+from pathlib import Path
+from typing import Any, Dict, List
+
+from .encoding import FPS
+
+HLS_SEGMENT_SEC = float(os.getenv("HLS_SEGMENT_SEC", "4.0"))
+
+def cut_times(scenes: List[Dict[str, Any]], segment_sec: float) -> List[float]:
+    """
+    Segment start times (excluding 0): every scene boundary, plus every
+    segment_sec inside scenes longer than that. A sliver shorter than a third
+    of segment_sec at the end of a scene is folded into the previous segment.
+    """
+    cuts: List[float] = []
+    t = 0.0
+    for sc in scenes:
+        dur = float(sc["duration"])
+        if t > 0:
+            cuts.append(round(t, 3))
+        k = 1
+        while segment_sec > 0 and dur - k * segment_sec > segment_sec / 3:
+            cuts.append(round(t + k * segment_sec, 3))
+            k += 1
+        t += dur
+    return cuts
+
+def _parse_playlist(m3u8: Path) -> List[Dict[str, Any]]:
+    segs, dur = [], None
+    for line in m3u8.read_text().splitlines():
+        line = line.strip()
+        if line.startswith("#EXTINF:"):
+            dur = float(line[8:].split(",")[0])
+        elif line and not line.startswith("#") and dur is not None:
+            segs.append({"uri": line, "duration": dur})
+            dur = None
+    return segs
+
+def package_hls(mp4: Path, scenes: List[Dict[str, Any]], out_dir: Path,
+                segment_sec: float = HLS_SEGMENT_SEC) -> Dict[str, Any]:
+    """
+    Split an already-encoded mp4 into MPEG-TS segments plus index.m3u8 without
+    re-encoding; cuts land on the keyframes render_manim forced at cut_times().
+    Scene clips are stream-copied into mp4, so a scene's first keyframe can sit a
+    fraction of a frame before the summed durations: the segment muxer accepts a
+    keyframe up to half a frame early. Also writes chapters.json mapping each scene
+    to its time range and segments.
+    """
+    out_dir.mkdir(parents=True, exist_ok=True)
+    playlist = out_dir / "index.m3u8"
+    cuts = cut_times(scenes, segment_sec)
+    seg_times = ["-segment_times", ",".join(f"{t:.3f}" for t in cuts)] if cuts else []
+    subprocess.check_call([
+        "ffmpeg","-y","-i",str(mp4),
+        "-map","0","-c","copy",
+        "-f","segment",*seg_times,"-segment_time_delta",f"{1 / (2 * FPS):.4f}",
+        "-segment_format","mpegts",
+        "-segment_list",str(playlist),"-segment_list_type","m3u8",
+        str(out_dir / "seg_%05d.ts")
+    ])
+
+    # segments begin on the forced keyframes, so a segment's start time picks its scene
+    chapters, t = [], 0.0
+    for sc in scenes:
+        end = t + float(sc["duration"])
+        chapters.append({"index": sc["index"], "type": sc.get("type"),
+                         "start": round(t, 3), "end": round(end, 3), "segments": []})
+        t = end
+    seg_start = 0.0
+    for seg in _parse_playlist(playlist):
+        owner = next((ch for ch in chapters if seg_start < ch["end"] - 0.05), None)
+        if owner is None and chapters:
+            owner = chapters[-1]
+        if owner is not None:
+            owner["segments"].append(seg["uri"])
+        seg_start += seg["duration"]
+
+    index = {"version": 1, "playlist": playlist.name, "segmentSec": segment_sec, "scenes": chapters}
+    (out_dir / "chapters.json").write_text(json.dumps(index, indent=2), encoding="utf-8")
+    return index
@@ -0,0 +1,325 @@
+# renderer/app/loadtest.py
+"""
+Renderer load test against local stand-ins for R2 signed URLs, the backend
+callback and the Stream direct-upload endpoint.
+
+    python -m app.loadtest --spawn -n 40 -c 4 --mix small=5,medium=3,large=1
+
+--spawn starts `uvicorn app.main:app` wired to the stand-ins. Without it, point
+--renderer at a running instance started with the env this tool prints.
+"""
+import argparse, hashlib, io, json, math, os, random, struct, subprocess, sys, threading, time, uuid, wave
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import urlparse, parse_qs, quote
+
+import requests
+
+RENDER_TOKEN = "loadtest-render-token"
+CALLBACK_TOKEN = "loadtest-callback-token"
+
+# scene count and array size per job class
+JOB_CLASSES = {
+    "small":  {"scenes": 4,  "array": 6},
+    "medium": {"scenes": 12, "array": 10},
+    "large":  {"scenes": 36, "array": 16},
+}
+
+
+# --------------------------------------------------------------------------------------
+# Stand-in services (one threaded HTTP server, routed by path)
+# --------------------------------------------------------------------------------------
+class StandIn:
+    def __init__(self, host: str = "127.0.0.1", port: int = 0):
+        self.assets: Dict[str, bytes] = {}
+        self.callbacks: Dict[str, List[dict]] = {}
+        self.uploads = 0
+        self.upload_bytes = 0
+        self.lock = threading.Lock()
+        self.httpd = ThreadingHTTPServer((host, port), self._handler())
+        self.httpd.daemon_threads = True
+        self.base = f"http://{host}:{self.httpd.server_address[1]}"
+
+    def start(self):
+        threading.Thread(target=self.httpd.serve_forever, daemon=True).start()
+
+    def stop(self):
+        self.httpd.shutdown()
+
+    def asset_url(self, key: str) -> str:
+        # same shape as the backend's signed URLs; exp/sig are not checked
+        exp = int(time.time()) + 3600
+        return f"{self.base}/assets/get?key={quote(key, safe='')}&exp={exp}&sig={uuid.uuid4().hex}"
+
+    def upload_url(self) -> str:
+        return f"{self.base}/stream/{uuid.uuid4().hex}"
+
+    def _handler(self):
+        st = self
+
+        class H(BaseHTTPRequestHandler):
+            def log_message(self, *a):
+                pass
+
+            def _reply(self, code: int, body: bytes = b"", ctype: str = "application/json", extra=None):
+                self.send_response(code)
+                self.send_header("Content-Type", ctype)
+                self.send_header("Content-Length", str(len(body)))
+                for k, v in (extra or {}).items():
+                    self.send_header(k, v)
+                self.end_headers()
+                if self.command != "HEAD":
+                    self.wfile.write(body)
+
+            def _asset(self):
+                key = (parse_qs(urlparse(self.path).query).get("key") or [""])[0]
+                data = st.assets.get(key)
+                if data is None:
+                    return self._reply(404, b'{"error":"not found"}')
+                etag = '"%s"' % hashlib.md5(data).hexdigest()
+                self._reply(200, data, "application/octet-stream", {"ETag": etag})
+
+            def do_HEAD(self):
+                if self.path.startswith("/assets/get"):
+                    return self._asset()
+                self._reply(404)
+
+            def do_GET(self):
+                if self.path.startswith("/assets/get"):
+                    return self._asset()
+                self._reply(404)
+
+            def do_POST(self):
+                n = int(self.headers.get("Content-Length") or 0)
+                path = urlparse(self.path).path
+                if path.startswith("/stream/"):
+                    left = n
+                    while left > 0:  # drain without buffering the whole video
+                        chunk = self.rfile.read(min(left, 1 << 20))
+                        if not chunk:
+                            break
+                        left -= len(chunk)
+                    with st.lock:
+                        st.uploads += 1
+                        st.upload_bytes += n
+                    return self._reply(200, b"{}")
+                body = self.rfile.read(n) if n else b""
+                if path.startswith("/api/jobs/") and path.endswith("/callback"):
+                    if self.headers.get("Authorization") != f"Bearer {CALLBACK_TOKEN}":
+                        return self._reply(401, b'{"error":"bad token"}')
+                    job_id = path.split("/")[3]
+                    try:
+                        cb = json.loads(body or b"{}")
+                    except ValueError:
+                        cb = {}
+                    cb["at"] = time.monotonic()
+                    with st.lock:
+                        st.callbacks.setdefault(job_id, []).append(cb)
+                    return self._reply(200, b'{"ok":true}')
+                self._reply(404)
+
+        return H
+
+
+# --------------------------------------------------------------------------------------
+# Synthetic jobs
+# --------------------------------------------------------------------------------------
+def _tone(seconds: float, hz: float, sr: int = 22050) -> bytes:
+    buf = io.BytesIO()
+    with wave.open(buf, "w") as w:
+        w.setnchannels(1); w.setsampwidth(2); w.setframerate(sr)
+        w.writeframes(b"".join(
+            struct.pack("<h", int(32767 * 0.2 * math.sin(2 * math.pi * hz * n / sr)))
+            for n in range(int(sr * seconds))
+        ))
+    return buf.getvalue()
+
+def _scenes(n_scenes: int, n_array: int, rng: random.Random) -> dict:
+    nums = sorted(rng.sample(range(100), n_array))
+    scenes = [{"t": "TitleCard", "text": "Load test"}]
+    lo, hi = 0, n_array - 1
+    while len(scenes) < n_scenes - 2:
+        mid = (lo + hi) // 2
+        kind = len(scenes) % 3
+        if kind == 0:
+            scenes.append({"t": "ArrayTape", "left": lo, "right": hi, "mid": mid})
+        elif kind == 1:
+            scenes.append({"t": "Callout", "text": f"Check index {mid}"})
+        else:
+            lo = min(mid + 1, hi) if lo < hi else 0
+            scenes.append({"t": "MovePointer", "which": "left", "to": lo})
+            # the normalizer drops a first move with no known origin; its audio line goes unused
+            scenes.append({"t": "ArrayTape", "left": lo, "right": hi, "mid": (lo + hi) // 2})
+    scenes.append({"t": "ComplexityCard"})
+    scenes.append({"t": "ResultCard", "text": "Done"})
+    return {"version": "1.0", "input": {"nums": nums, "target": nums[0]}, "scenes": scenes}
+
+def make_job(st: StandIn, cls: str, rng: random.Random, unique_audio: bool) -> dict:
+    spec = JOB_CLASSES[cls]
+    job_id = f"lt-{cls}-{uuid.uuid4().hex[:10]}"
+    prefix = f"jobs/{job_id}"
+    events = _scenes(spec["scenes"], spec["array"], rng)
+    n_lines = len(events["scenes"])
+    st.assets[f"{prefix}/events.json"] = json.dumps(events).encode()
+    st.assets[f"{prefix}/narration.json"] = json.dumps({"lines": ["line"] * n_lines}).encode()
+    st.assets[f"{prefix}/complexity.json"] = json.dumps({"time": "O(log n)", "space": "O(1)"}).encode()
+    st.assets[f"{prefix}/sync.json"] = json.dumps({"pairs": [], "breath_gap_sec": 0.12}).encode()
+    audio = []
+    for i in range(n_lines):
+        # shared tones exercise the asset cache like repeated TTS lines do
+        hz = 300 + (rng.random() * 400 if unique_audio else (i % 5) * 60)
+        key = f"{prefix}/audio/{i:03d}.wav"
+        st.assets[key] = _tone(1.5 + (i % 3) * 0.5, hz)
+        audio.append(st.asset_url(key))
+    return {
+        "jobId": job_id,
+        "assets": {
+            "eventsUrl": st.asset_url(f"{prefix}/events.json"),
+            "narrationUrl": st.asset_url(f"{prefix}/narration.json"),
+            "complexityUrl": st.asset_url(f"{prefix}/complexity.json"),
+            "syncUrl": st.asset_url(f"{prefix}/sync.json"),
+            "audioUrls": audio,
+        },
+        "stream": {"uploadURL": st.upload_url()},
+        "hints": {"scenes": n_lines, "maxArrayLen": spec["array"]},
+    }
+
+def parse_mix(s: str) -> List[Tuple[str, float]]:
+    out = []
+    for part in s.split(","):
+        name, _, w = part.partition("=")
+        name = name.strip()
+        if name not in JOB_CLASSES:
+            raise SystemExit(f"unknown job class {name!r} (have {', '.join(JOB_CLASSES)})")
+        out.append((name, float(w or 1)))
+    return out
+
+
+# --------------------------------------------------------------------------------------
+# Driver + report
+# --------------------------------------------------------------------------------------
+def pct(xs: List[float], p: float) -> float:
+    if not xs:
+        return 0.0
+    xs = sorted(xs)
+    return xs[max(0, min(len(xs) - 1, math.ceil(p / 100 * len(xs)) - 1))]
+
+def spawn_renderer(st: StandIn, port: int, extra_env: Dict[str, str]) -> subprocess.Popen:
+    env = dict(os.environ, **renderer_env(st), **extra_env)
+    proc = subprocess.Popen([sys.executable, "-m", "uvicorn", "app.main:app", "--host", "127.0.0.1", "--port", str(port)], env=env)
+    url = f"http://127.0.0.1:{port}"
+    for _ in range(120):
+        try:
+            if requests.get(f"{url}/healthz", timeout=1).ok:
+                return proc
+        except requests.RequestException:
+            pass
+        if proc.poll() is not None:
+            raise SystemExit(f"renderer exited with {proc.returncode}")
+        time.sleep(0.5)
+    proc.terminate()
+    raise SystemExit("renderer did not become healthy")
+
+def renderer_env(st: StandIn) -> Dict[str, str]:
+    return {
+        "RENDER_TOKEN": RENDER_TOKEN,
+        "CALLBACK_TOKEN": CALLBACK_TOKEN,
+        "BACKEND_BASE_URL": st.base,
+        "STREAM_UPLOAD_HOSTS": "127.0.0.1",
+        "SKIP_STREAM": "0",
+    }
+
+def post_render(renderer: str, payload: dict, timeout: float) -> Tuple[int, float, str]:
+    t0 = time.monotonic()
+    try:
+        r = requests.post(f"{renderer}/render", json=payload, timeout=timeout,
+                          headers={"Authorization": f"Bearer {RENDER_TOKEN}"})
+        return r.status_code, time.monotonic() - t0, "" if r.ok else r.text[:200]
+    except requests.RequestException as e:
+        return 0, time.monotonic() - t0, repr(e)[:200]
+
+def main(argv: Optional[List[str]] = None) -> int:
+    ap = argparse.ArgumentParser(prog="python -m app.loadtest")
+    ap.add_argument("-n", "--jobs", type=int, default=20)
+    ap.add_argument("-c", "--concurrency", type=int, default=2)
+    ap.add_argument("--mix", default="small=5,medium=3,large=1", help="job class weights")
+    ap.add_argument("--renderer", default=None, help="base URL of a running renderer")
+    ap.add_argument("--spawn", action="store_true", help="start a renderer wired to the stand-ins")
+    ap.add_argument("--port", type=int, default=8099, help="port for --spawn")
+    ap.add_argument("--standin-port", type=int, default=0)
+    ap.add_argument("--timeout", type=float, default=1800)
+    ap.add_argument("--unique-audio", action="store_true", help="no shared audio bytes between jobs")
+    ap.add_argument("--seed", type=int, default=1)
+    ap.add_argument("--json", help="also write the report JSON here")
+    args = ap.parse_args(argv)
+
+    if not args.spawn and not args.renderer:
+        ap.error("pass --renderer URL or --spawn")
+
+    st = StandIn(port=args.standin_port)
+    st.start()
+    proc = None
+    if args.spawn:
+        proc = spawn_renderer(st, args.port, {})
+        renderer = f"http://127.0.0.1:{args.port}"
+    else:
+        renderer = args.renderer.rstrip("/")
+        print("renderer must run with:", " ".join(f"{k}={v}" for k, v in renderer_env(st).items()))
+
+    rng = random.Random(args.seed)
+    mix = parse_mix(args.mix)
+    names, weights = [m[0] for m in mix], [m[1] for m in mix]
+    jobs = [(c, make_job(st, c, rng, args.unique_audio)) for c in rng.choices(names, weights, k=args.jobs)]
+
+    results = []  # (class, jobId, status, seconds, err)
+    t0 = time.monotonic()
+    try:
+        with ThreadPoolExecutor(max_workers=args.concurrency) as ex:
+            futs = {ex.submit(post_render, renderer, p, args.timeout): (c, p["jobId"]) for c, p in jobs}
+            for fut in as_completed(futs):
+                c, job_id = futs[fut]
+                code, sec, err = fut.result()
+                results.append((c, job_id, code, sec, err))
+                print(f"{'OK ' if code == 200 else 'ERR'} {job_id} {code} {sec:.1f}s {err}")
+        wall = time.monotonic() - t0
+        time.sleep(1.0)  # late callbacks
+    finally:
+        if proc is not None:
+            proc.terminate()
+            proc.wait(timeout=30)
+        st.stop()
+
+    def summarize(rows):
+        lat = [r[3] for r in rows if r[2] == 200]
+        codes: Dict[str, int] = {}
+        for r in rows:
+            codes[str(r[2])] = codes.get(str(r[2]), 0) + 1
+        return {
+            "jobs": len(rows), "ok": len(lat),
+            "errorRate": round(1 - len(lat) / len(rows), 4) if rows else 0.0,
+            "p50": round(pct(lat, 50), 2), "p95": round(pct(lat, 95), 2), "p99": round(pct(lat, 99), 2),
+            "statusCodes": codes,
+        }
+
+    ok = sum(1 for r in results if r[2] == 200)
+    cb_done = sum(1 for r in results if any(c.get("status") == "done" for c in st.callbacks.get(r[1], [])))
+    cb_failed = sum(1 for r in results if any(c.get("status") == "failed" for c in st.callbacks.get(r[1], [])))
+    report = {
+        "concurrency": args.concurrency,
+        "wallSeconds": round(wall, 1),
+        "jobsPerMinute": round(ok / wall * 60, 2) if wall > 0 else 0.0,
+        "overall": summarize(results),
+        "byClass": {c: summarize([r for r in results if r[0] == c]) for c in names},
+        "callbacks": {"done": cb_done, "failed": cb_failed, "missing": len(results) - cb_done - cb_failed},
+        "uploads": {"count": st.uploads, "bytes": st.upload_bytes},
+    }
+    print(json.dumps(report, indent=2))
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+    return 0 if ok == len(results) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,18 +1,32 @@
 import base64
+import contextlib
+import hashlib
 import os
 import shutil
 import subprocess
 import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
 import time
 import json, wave, math, struct
 import requests
 from pathlib import Path
-from typing import List, Optional
+from typing import Dict, List, Literal, Optional
 from fastapi import FastAPI, Header, HTTPException, APIRouter
 from pydantic import BaseModel, Field, HttpUrl, ValidationError, model_validator 
 from urllib.parse import urlparse, parse_qs, unquote
-from .manim_render import render_manim  
-from fastapi.responses import FileResponse
+from .bundle import Bundle, BundleError, FFMPEG_WHITELIST, ffmpeg_path
+from .manim_render import render_manim, count_scenes, encode_renditions, frame_size, RENDER_HEIGHT, TAIL_PAD
+from .encoding import video_args, budget_kbps, stream_signature, dominant_profile, AUDIO_KBPS, ENCODE_PRESET, ENCODE_PROFILES
+from .worker import pool, JobKilled, JobCancelled, JobDeadline
+from .coalesce import Coalescer
+from .asset_cache import asset_cache
+from .hls import package_hls, HLS_SEGMENT_SEC
+from .admission import admission, estimate_cost, Overloaded
+from .distributed import should_distribute, render_distributed, cancel_on_peers, RENDER_PEERS
+from .capture import stage_inputs, write_archive, wants_staging, should_capture
+from fastapi.responses import FileResponse, JSONResponse
+from starlette.background import BackgroundTask
 
 # --------------------------------------------------------------------------------------
 # ENV
@@ -25,6 +39,15 @@ CALLBACK_TOKEN = os.getenv("CALLBACK_TOKEN", "dev-callback-token")  # for /api/j
 # we will call `${BACKEND_BASE_URL}/debug/stream/direct-upload` to obtain one.
 STREAM_DIRECT_UPLOAD_FALLBACK = os.getenv("STREAM_DIRECT_UPLOAD_FALLBACK", "0") == "1"
 LOCAL = os.getenv("SKIP_STREAM", "0") == "1"
+# host suffixes accepted as Stream direct-upload targets (the load-test stand-in adds 127.0.0.1)
+STREAM_UPLOAD_HOSTS = [h.strip() for h in os.getenv("STREAM_UPLOAD_HOSTS", "upload.cloudflarestream.com").split(",") if h.strip()]
+RENDER_DEADLINE_SEC = float(os.getenv("RENDER_DEADLINE_SEC", "900"))  # default per-job budget; payload.deadlineSec overrides
+OUTPUT_MODE = os.getenv("OUTPUT_MODE", "mp4")                          # "mp4" | "hls" (hls only with SKIP_STREAM=1)
+OUTPUT_DIR = Path(os.getenv("LOCAL_OUTPUT_DIR", "/output"))
+# default output ladder (heights), e.g. "1080,720,480"; empty = single RENDER_HEIGHT output
+RENDITIONS = [int(h) for h in os.getenv("RENDITIONS", "").split(",") if h.strip()]
+DEFAULT_BUNDLE_CLIPS = int(os.getenv("DEFAULT_BUNDLE_CLIPS", "12"))   # admission estimate for bundles without hints
+COALESCE_TTL_SEC = float(os.getenv("COALESCE_TTL_SEC", "600"))        # replay a finished render to duplicates for this long
 
 
 # --------------------------------------------------------------------------------------
@@ -32,29 +55,100 @@ LOCAL = os.getenv("SKIP_STREAM", "0") == "1"
 # --------------------------------------------------------------------------------------
 def is_stream_upload(url: str) -> bool:
     u = urlparse(url)
-    return u.scheme in ("http", "https") and u.netloc.endswith("upload.cloudflarestream.com") and len(u.path.strip("/")) >= 6
+    host = u.hostname or ""
+    return u.scheme in ("http", "https") and any(host.endswith(h) for h in STREAM_UPLOAD_HOSTS) and len(u.path.strip("/")) >= 6
 
 class Assets(BaseModel):
-    eventsUrl: HttpUrl
-    narrationUrl: HttpUrl
-    complexityUrl: HttpUrl
-    syncUrl: HttpUrl
-    audioUrls: List[HttpUrl] = Field(min_length=1)
+    # either one bundle (tar/zip, see bundle.py) or the individual signed URLs
+    bundleUrl: Optional[HttpUrl] = None
+    eventsUrl: Optional[HttpUrl] = None
+    narrationUrl: Optional[HttpUrl] = None
+    complexityUrl: Optional[HttpUrl] = None
+    syncUrl: Optional[HttpUrl] = None
+    audioUrls: Optional[List[HttpUrl]] = None
+
+    @model_validator(mode="after")
+    def _check_complete(self):
+        if self.bundleUrl is not None:
+            return self
+        missing = [k for k in ("eventsUrl", "narrationUrl", "complexityUrl", "syncUrl") if getattr(self, k) is None]
+        if missing:
+            raise ValueError(f"assets missing {', '.join(missing)} (or pass bundleUrl)")
+        if not self.audioUrls:
+            raise ValueError("assets.audioUrls must have at least 1 item (or pass bundleUrl)")
+        return self
+
+    def urls(self) -> List[HttpUrl]:
+        if self.bundleUrl is not None:
+            return [self.bundleUrl]
+        return [self.eventsUrl, self.narrationUrl, self.complexityUrl, self.syncUrl, *self.audioUrls]
 
 class StreamInfo(BaseModel):
     uploadURL: Optional[HttpUrl] = None
+    # lower renditions, keyed by height ("720"); the top rendition goes to uploadURL
+    renditionUploadURLs: Optional[Dict[str, HttpUrl]] = None
 
     @model_validator(mode="after")
     def _check_cf_stream(self):
         if self.uploadURL is not None and not is_stream_upload(str(self.uploadURL)):
             raise ValueError("stream.uploadURL is not a Cloudflare Stream direct-upload URL")
+        for h, u in (self.renditionUploadURLs or {}).items():
+            if not is_stream_upload(str(u)):
+                raise ValueError(f"stream.renditionUploadURLs[{h}] is not a Cloudflare Stream direct-upload URL")
         return self
 
+class CostHints(BaseModel):
+    # optional: lets admission control price the job before events.json is fetched
+    scenes: Optional[int] = Field(default=None, ge=0)
+    maxArrayLen: Optional[int] = Field(default=None, ge=0)
+
+class EncodeTarget(BaseModel):
+    # optional per-job output budget; both cap the video bitrate of every scene
+    videoKbps: Optional[int] = Field(default=None, ge=100)
+    maxMB: Optional[float] = Field(default=None, gt=0)  # whole output file, audio included
+
+# jobId becomes a file/dir name under OUTPUT_DIR: no separators, no "" or "."/".."
+JOB_ID_PATTERN = r"^[\w-]{1,80}$"
+
+class ScenesPayload(BaseModel):
+    # coordinator -> peer: render scenes [start, end) of a job from the same assets
+    jobId: str = Field(pattern=JOB_ID_PATTERN)
+    assets: Assets
+    start: int = Field(ge=0)
+    end: int = Field(gt=0)
+    deadlineSec: Optional[float] = Field(default=None, gt=0)
+    height: int = Field(default=RENDER_HEIGHT, ge=144, le=2160)
+    segmentSec: Optional[float] = Field(default=None, gt=0)  # HLS keyframe spacing inside scenes
+    maxKbps: Optional[int] = Field(default=None, ge=100)
+    encodeSignature: Optional[str] = None  # coordinator's encoding.stream_signature(); clips must match to be joined
+
 class RenderPayload(BaseModel):
-    jobId: str
+    jobId: str = Field(pattern=JOB_ID_PATTERN)
     algo_id: Optional[str] = None
     assets: Assets
     stream: StreamInfo
+    deadlineSec: Optional[float] = Field(default=None, gt=0)
+    output: Optional[Literal["mp4", "hls"]] = None
+    hints: Optional[CostHints] = None
+    renditions: Optional[List[int]] = Field(default=None, min_length=1)  # heights, e.g. [1080, 720, 480]
+    capture: bool = False  # archive inputs + timings for offline replay (see capture.py)
+    target: Optional[EncodeTarget] = None
+
+    @model_validator(mode="after")
+    def _check_renditions(self):
+        for h in self.renditions or []:
+            if not 144 <= h <= 2160:
+                raise ValueError(f"rendition height {h} out of range 144..2160")
+        return self
+
+    @model_validator(mode="after")
+    def _check_output(self):
+        if self.output == "hls" and not LOCAL:
+            raise ValueError("output 'hls' is only served with SKIP_STREAM=1; Stream uploads are mp4")
+        return self
+
+    def ladder(self) -> List[int]:
+        return sorted(set(self.renditions or RENDITIONS or [RENDER_HEIGHT]), reverse=True)
 
 # --------------------------------------------------------------------------------------
 # FastAPI
@@ -76,11 +170,41 @@ def _check_auth(auth_header: Optional[str]):
     if auth_header[7:] != RENDER_TOKEN:
         raise HTTPException(status_code=401, detail="bad bearer")
 
+# jobId -> cancel flags of renders currently running on this instance
+_active: Dict[str, List[threading.Event]] = {}
+_active_lock = threading.Lock()
+
+def _check_job(cancel: threading.Event, deadline: float):
+    # parent-side stages (preflight, upload) check between steps; the worker is killed by the pool
+    if cancel.is_set():
+        raise JobCancelled("CANCELLED: job cancelled")
+    if time.monotonic() > deadline:
+        raise JobDeadline("DEADLINE_EXCEEDED: job ran past its deadline")
+
+# duplicate POSTs (queue redelivery, backend retries) share one render
+coalescer = Coalescer(COALESCE_TTL_SEC)
+
+def _asset_identity(url: str) -> str:
+    # the R2 key is stable across re-signing; exp/sig are not
+    u = urlparse(url)
+    qs = parse_qs(u.query)
+    key = qs.get("key") or qs.get("k")
+    if key:
+        return unquote(key[0])
+    return f"{u.netloc}{u.path}"
+
+def payload_fingerprint(payload: "RenderPayload") -> str:
+    urls = payload.assets.urls()
+    parts = [payload.jobId, payload.algo_id or "", payload.output or OUTPUT_MODE,
+             ",".join(map(str, payload.ladder())),
+             payload.target.model_dump_json() if payload.target else ""] + [_asset_identity(str(u)) for u in urls]
+    return hashlib.sha256("\n".join(parts).encode()).hexdigest()
+
 def run(cmd: List[str]):
     # surface ffmpeg errors clearly
     subprocess.check_call(cmd)
 
-def ffprobe_duration(path: Path) -> float:
+def ffprobe_duration(path: Path | str) -> float:
     cmd = ["ffprobe", "-v", "error", "-show_entries", "format=duration", "-of", "default=nk=1:nw=1", str(path)]
     try:
         out = subprocess.check_output(cmd, text=True).strip()
@@ -104,18 +228,37 @@ def infer_asset_filename(url: str, default: str = "asset.json") -> str:
     name = Path(u.path).name
     return name or default
 
-def download(url: str, dest: Path):
+def download(url: str, dest: Path, cache: bool = False):
+    """
+    With cache=True the body is served from / stored in the shared asset cache,
+    keyed by strong ETag. The lookup is a HEAD, so a hit never GETs the body.
+    Responses without an ETag are always downloaded.
+    """
     dest.parent.mkdir(parents=True, exist_ok=True)
+    use_cache = cache and asset_cache.enabled
+    if use_cache:
+        key = _asset_identity(url)
+        try:
+            h = requests.head(url, timeout=10, allow_redirects=True)
+            hit = asset_cache.lookup(key, h.headers.get("ETag")) if h.ok else None
+        except requests.RequestException:
+            hit = None  # the GET below reports the real error
+        if hit is not None and asset_cache.link_into(hit, dest):
+            return
     with requests.get(url, stream=True, timeout=60) as r:
         r.raise_for_status()
+        etag = r.headers.get("ETag")
         # ensure gzip/deflate are decompressed before writing
         r.raw.decode_content = True
-        with open(dest, "wb") as f:
-            shutil.copyfileobj(r.raw, f)
+        if use_cache:
+            asset_cache.store(r.raw, key, etag, dest)
+        else:
+            with open(dest, "wb") as f:
+                shutil.copyfileobj(r.raw, f)
     if not dest.exists() or dest.stat().st_size == 0:
         raise FileNotFoundError(f"wrote zero bytes to {dest}")
 
-def assemble_audio(audio_files: List[Path], out_audio: Path):
+def assemble_audio(audio_files: List[Path | str], out_audio: Path):
     """
     Re-encode all inputs to AAC via concat demuxer for compatibility.
     """
@@ -128,18 +271,20 @@ def assemble_audio(audio_files: List[Path], out_audio: Path):
     list_txt = out_audio.with_suffix(".txt")
     with open(list_txt, "w") as f:
         for p in audio_files:
-            f.write(f"file '{p.as_posix()}'\n")
+            f.write(f"file '{ffmpeg_path(p)}'\n")
 
-    run(["ffmpeg", "-y", "-f", "concat", "-safe", "0", "-i", str(list_txt), "-c:a", "aac", str(out_audio)])
+    run(["ffmpeg", "-y", "-f", "concat", "-safe", "0", *FFMPEG_WHITELIST, "-i", str(list_txt), "-c:a", "aac", str(out_audio)])
 
-def make_video(total_dur: float, audio_path: Path, out_mp4: Path):
-    # simple black 720p background, yuv420p for cross-player compatibility
+def make_video(total_dur: float, audio_path: Path, out_mp4: Path, height: int = RENDER_HEIGHT,
+               keyframe_sec: Optional[float] = None):
+    # simple black background, yuv420p for cross-player compatibility; static, so the "still" profile
+    w, h = frame_size(height)
     run([
         "ffmpeg", "-y",
-        "-f", "lavfi", "-i", f"color=c=black:s=1280x720:d={max(total_dur, 0.5):.2f}",
+        "-f", "lavfi", "-i", f"color=c=black:s={w}x{h}:r=30:d={max(total_dur, 0.5):.2f}",
         "-i", str(audio_path),
-        "-c:v", "libx264", "-pix_fmt", "yuv420p",
-        "-c:a", "aac",
+        *video_args("still", keyframe_sec),
+        "-c:a", "aac", "-b:a", f"{AUDIO_KBPS}k",
         "-shortest",
         str(out_mp4)
     ])
@@ -172,9 +317,9 @@ def tus_upload(upload_url: str, file_path: Path, filename: str = "out.mp4", mime
     return uid
 
 # NEW: basic direct-upload (multipart/form-data)
-def basic_upload(upload_url: str, file_path: Path):
+def basic_upload(upload_url: str, file_path: Path, timeout: float = 300):
     with open(file_path, "rb") as f:
-        r = requests.post(upload_url, files={"file": (file_path.name, f, "video/mp4")}, timeout=300)
+        r = requests.post(upload_url, files={"file": (file_path.name, f, "video/mp4")}, timeout=timeout)
     if r.status_code != 200:
         raise RuntimeError(f"basic upload failed {r.status_code}: {r.text}")
     # uid is the last path segment of upload_url for direct-upload
@@ -202,6 +347,179 @@ def safe_callback(job_id, status, message, uid=None, playback=None):
     except Exception as e:
         print("CALLBACK_ERROR:", repr(e))
 
+@contextlib.contextmanager
+def _scratch(td_str: str):
+    # keep every scratch file (ffmpeg temps, Manim media) under td so a killed job leaves nothing behind
+    prev_cwd, prev_tmp = os.getcwd(), tempfile.tempdir
+    os.chdir(td_str); tempfile.tempdir = td_str
+    try:
+        yield Path(td_str)
+    finally:
+        os.chdir(prev_cwd); tempfile.tempdir = prev_tmp
+
+def _produce_video(td_str: str, assets: dict, hls: bool = False, job_id: str = "",
+                   deadline: Optional[float] = None, ladder: Optional[List[int]] = None,
+                   stage: bool = False, target: Optional[dict] = None) -> dict:
+    """
+    Download assets into td and render out.mp4 there (plus td/hls/ when hls=True).
+    Scenes are rasterized once at the top of `ladder`; lower renditions are scaled
+    from that. Runs inside a worker process (see worker.py), so everything it spawns
+    dies with the worker.
+    With stage=True the fetched inputs are also staged for capture.py.
+    target is an EncodeTarget dump; it caps every scene's video bitrate.
+    Returns {"mp4": path, "scenes": [...], "hls": dir or None, "renditions": {height: path},
+             "timings": {stage: seconds}}.
+    """
+    with _scratch(td_str) as td:
+        return _produce_video_in(td, Assets.model_validate(assets), hls, job_id, deadline,
+                                 ladder or [RENDER_HEIGHT], stage, target)
+
+def _produce_range(td_str: str, assets: dict, start: int, end: int, height: int = RENDER_HEIGHT,
+                   segment_sec: Optional[float] = None, max_kbps: Optional[int] = None) -> dict:
+    """Peer side of distributed rendering: scenes [start, end) only, no fallback video."""
+    with _scratch(td_str) as td:
+        ev, syncp, audio_files, _ = _fetch_assets(td, Assets.model_validate(assets))
+        if ev is None:
+            raise Fail("FETCH_ERROR: events asset missing")
+        out_mp4 = td / "range.mp4"
+        scenes = render_manim(ev, audio_files, out_mp4, sync_json=syncp, segment_sec=segment_sec,
+                              scene_range=(start, end), height=height, max_kbps=max_kbps)
+        return {"mp4": str(out_mp4), "scenes": scenes}
+
+def _fetch_bundle(td: Path, url: str):
+    """
+    One streamed download; members stay inside the bundle file. JSON comes back as
+    bytes sliced from an mmap, audio as ffmpeg byte-range inputs on the bundle.
+    """
+    dest = td / "bundle"
+    download(url, dest)
+    try:
+        with Bundle(dest) as b:
+            ev = b.read(b.find("events")) if b.find("events") else None
+            syncp = b.read(b.find("sync")) if b.find("sync") else None
+            extra = {k: b.read(b.find(k)) for k in ("narration", "complexity") if b.find(k)}
+            # not filesystem paths: ffmpeg subfile URLs (str) into the bundle file
+            audio_files: List[Path | str] = [b.ffmpeg_input(n) for n in b.audio_members()]
+    except BundleError as e:
+        raise Fail(f"VALIDATION_ERROR: {e}")
+    if not audio_files:
+        raise Fail("VALIDATION_ERROR: no audio files")
+    return ev, syncp, audio_files, extra
+
+def _fetch_assets(td: Path, assets: Assets):
+    """
+    Download JSON assets and audio into td. Returns (events, sync, audio_files, extra);
+    extra maps the other JSON kinds (narration, complexity) to what was fetched.
+    """
+    if assets.bundleUrl is not None:
+        return _fetch_bundle(td, str(assets.bundleUrl))
+
+    # Download JSON assets
+    ev = nar = cx = syncp = None
+    for item in [
+        ("events", str(assets.eventsUrl)),
+        ("narration", str(assets.narrationUrl)),
+        ("complexity", str(assets.complexityUrl)),
+        ("sync", str(assets.syncUrl))
+    ]:
+        try:
+            if not item:
+                continue
+            kind, url = item
+            name = infer_asset_filename(url, default=f"{kind}.json")
+            dest = td / name
+            download(url, dest)
+            if   kind == "events":     ev = dest
+            elif kind == "narration":  nar = dest
+            elif kind == "complexity": cx = dest
+            elif kind == "sync":       syncp = dest
+        except Exception as e:
+            print("WARN: JSON asset fetch failed:", url, e)
+
+    # Download per-scene audio
+    audio_files: List[Path | str] = []
+    for i, aurl in enumerate(assets.audioUrls):
+        aurl = str(aurl)
+        name = infer_asset_filename(aurl, default=f"{i:03d}.mp3")
+        ext = Path(name).suffix or ".mp3"
+        p = td / f"{i:03d}{ext}"
+        download(aurl, p, cache=True)
+        audio_files.append(p)
+
+    if not audio_files:
+        raise Fail("VALIDATION_ERROR: no audio files")
+    extra = {k: v for k, v in (("narration", nar), ("complexity", cx)) if v is not None}
+    return ev, syncp, audio_files, extra
+
+def _produce_video_in(td: Path, assets: Assets, hls: bool, job_id: str, deadline: Optional[float],
+                      ladder: List[int], stage: bool = False, target: Optional[dict] = None) -> dict:
+    timings: Dict[str, float] = {}
+    t0 = time.monotonic()
+
+    def lap(name: str):
+        nonlocal t0
+        now = time.monotonic()
+        timings[name] = round(now - t0, 2)
+        t0 = now
+
+    ev, syncp, audio_files, extra = _fetch_assets(td, assets)
+    lap("fetch")
+    if stage and ev is not None:
+        stage_inputs(td, ev, syncp, audio_files, bundle=td / "bundle" if assets.bundleUrl else None, extra=extra)
+        lap("stage")
+
+    # Concat total audio (fallback only)
+    out_audio = td / "combined.m4a"
+    assemble_audio(audio_files, out_audio)
+    lap("audio")
+
+    max_kbps = None
+    if target:
+        # output length ~ narration plus each scene's tail pad; overestimating only tightens the cap
+        seconds = ffprobe_duration(out_audio) + len(audio_files) * TAIL_PAD
+        max_kbps = budget_kbps(target.get("videoKbps"), target.get("maxMB"), seconds)
+
+    # Render (prefer Manim)
+    out_mp4 = td / "out.mp4"
+    seg = HLS_SEGMENT_SEC if hls else None
+    top = max(ladder)
+    scenes = None
+    try:
+        use_manim = os.getenv("USE_MANIM", "1") == "1" and ev and audio_files
+        if use_manim:
+            n_scenes = count_scenes(ev)
+            if should_distribute(n_scenes):
+                scenes = render_distributed(job_id, assets.model_dump(mode="json"), ev, audio_files, out_mp4,
+                                            n_scenes, sync_json=syncp, segment_sec=seg, deadline=deadline,
+                                            height=top, max_kbps=max_kbps)
+            else:
+                scenes = render_manim(ev, audio_files, out_mp4, sync_json=syncp, segment_sec=seg, height=top,
+                                      max_kbps=max_kbps)
+        else:
+            total = sum((ffprobe_duration(p) or 2.0) for p in audio_files)
+            make_video(total, out_audio, out_mp4, top, seg)
+    except Exception as e:
+        print("WARN: manim render failed, falling back:", e)
+        total = sum((ffprobe_duration(p) or 2.0) for p in audio_files)
+        make_video(total, out_audio, out_mp4, top, seg)
+    if not scenes:
+        scenes = [{"index": 0, "type": "fallback", "duration": ffprobe_duration(out_mp4),
+                   "profile": "still", "bytes": out_mp4.stat().st_size}]
+    lap("render")
+
+    hls_dir = None
+    if hls:
+        hls_dir = td / "hls"
+        package_hls(out_mp4, scenes, hls_dir, seg)
+        lap("hls")
+
+    renditions = encode_renditions(out_mp4, ladder, td, profile=dominant_profile(scenes), max_kbps=max_kbps)
+    if len(renditions) > 1:
+        lap("renditions")
+
+    return {"mp4": str(out_mp4), "scenes": scenes, "hls": str(hls_dir) if hls_dir else None,
+            "renditions": {h: str(p) for h, p in renditions.items()}, "timings": timings, "maxKbps": max_kbps}
+
 # --------------------------------------------------------------------------------------
 # Endpoints
 # --------------------------------------------------------------------------------------
@@ -281,12 +599,24 @@ def demo_rotated_bs():
     render_manim(ev_path, audio_files, out_mp4)
     return {"ok": True, "localPath": str(out_mp4)}
 
-@app.get("/files/{name}")
+_MEDIA_TYPES = {
+    ".mp4": "video/mp4",
+    ".m3u8": "application/vnd.apple.mpegurl",
+    ".ts": "video/mp2t",
+    ".json": "application/json",
+}
+
+@app.get("/files/{name:path}")
 def get_file(name: str):
-    p = Path("/output") / name
-    if not p.exists():
+    root = OUTPUT_DIR.resolve()
+    p = (root / name).resolve()
+    if root not in p.parents or not p.is_file():
         raise HTTPException(status_code=404, detail="not found")
-    return FileResponse(str(p), media_type="video/mp4")
+    return FileResponse(str(p), media_type=_MEDIA_TYPES.get(p.suffix, "application/octet-stream"))
+
+@app.on_event("shutdown")
+def _stop_workers():
+    pool.shutdown()
 
 @app.get("/healthz")
 def healthz():
@@ -294,17 +624,166 @@ def healthz():
 
 @app.get("/readyz")
 def readyz():
-    # naive: ensure ffmpeg is callable
+    # ffmpeg callable and room for at least a minimal job; 503 tells the LB to route elsewhere
     try:
         subprocess.check_output(["ffmpeg", "-version"])
     except Exception:
-        return {"ok": False}
-    return {"ok": True}
+        return JSONResponse({"ok": False}, status_code=503)
+    cap = admission.stats()
+    ok = cap["inflight"] == 0 or cap["free"] >= estimate_cost(1)
+    body = {"ok": ok, "capacity": cap, "workers": pool.stats(), "assetCache": asset_cache.stats()}
+    return body if ok else JSONResponse(body, status_code=503)
+
+@app.delete("/render/{job_id}")
+def cancel_render(job_id: str, authorization: Optional[str] = Header(None)):
+    _check_auth(authorization)
+    with _active_lock:
+        flags = list(_active.get(job_id) or [])
+    if not flags:
+        raise HTTPException(status_code=404, detail="job not running")
+    for ev in flags:
+        ev.set()
+    if RENDER_PEERS:
+        threading.Thread(target=cancel_on_peers, args=(job_id,), daemon=True).start()
+    return {"ok": True, "jobId": job_id, "cancelled": True}
 
 @app.post("/render")
 def render(payload: RenderPayload, authorization: Optional[str] = Header(None)):
     _check_auth(authorization)
 
+    fp = payload_fingerprint(payload)
+    while True:
+        res, how = coalescer.run(fp, lambda: _render_admitted(payload))
+        # a cached local result is only useful while the file is still there
+        if how == "cached" and res.get("localPath") and not Path(res["localPath"]).exists():
+            coalescer.forget(fp)
+            continue
+        break
+    if how != "leader":
+        print(f"COALESCED: job={payload.jobId} how={how}")
+        res = {**res, "coalesced": how}
+    return res
+
+def _admit(job_id: str, cost: float):
+    # priced and admitted before any download; rejection is retryable and sends no callback
+    try:
+        return admission.admit(cost)
+    except Overloaded as e:
+        print(f"ADMISSION_REJECT: job={job_id} {e}")
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": str(e.retry_after)})
+
+@contextlib.contextmanager
+def _tracked(job_id: str):
+    # registers a cancel flag for DELETE /render/{jobId}
+    cancel = threading.Event()
+    with _active_lock:
+        _active.setdefault(job_id, []).append(cancel)
+    try:
+        yield cancel
+    finally:
+        with _active_lock:
+            flags = _active.get(job_id) or []
+            if cancel in flags:
+                flags.remove(cancel)
+            if not flags:
+                _active.pop(job_id, None)
+
+def _audio_count(assets: Assets, hints: Optional["CostHints"] = None) -> int:
+    # a bundle's clip count is unknown until it is opened; price it from hints
+    if assets.audioUrls:
+        return len(assets.audioUrls)
+    return (hints.scenes if hints and hints.scenes else None) or DEFAULT_BUNDLE_CLIPS
+
+def _render_admitted(payload: RenderPayload):
+    h = payload.hints or CostHints()
+    cost = estimate_cost(_audio_count(payload.assets, h), h.scenes, h.maxArrayLen, payload.ladder())
+    with _admit(payload.jobId, cost):
+        return _render_tracked(payload)
+
+def _render_tracked(payload: RenderPayload):
+    deadline = time.monotonic() + (payload.deadlineSec or RENDER_DEADLINE_SEC)
+    with _tracked(payload.jobId) as cancel:
+        return _render_job(payload, deadline, cancel)
+
+@app.post("/render/scenes")
+def render_scenes(payload: ScenesPayload, authorization: Optional[str] = Header(None)):
+    """Peer endpoint for distributed rendering: returns the clip for one scene range."""
+    _check_auth(authorization)
+    if payload.end <= payload.start:
+        raise HTTPException(status_code=422, detail="empty scene range")
+    if payload.encodeSignature and payload.encodeSignature != stream_signature():
+        # our clips could not be stream-copied into the coordinator's output; it renders the range elsewhere
+        raise HTTPException(status_code=409, detail=f"ENCODE_MISMATCH: peer signature {stream_signature()}")
+
+    deadline = time.monotonic() + (payload.deadlineSec or RENDER_DEADLINE_SEC)
+    cost = estimate_cost(_audio_count(payload.assets), payload.end - payload.start, ladder=[payload.height])
+    td_str = tempfile.mkdtemp(prefix="range-")
+    try:
+        with _admit(payload.jobId, cost), _tracked(payload.jobId) as cancel:
+            job = pool.run(_produce_range, td_str, payload.assets.model_dump(mode="json"),
+                           payload.start, payload.end, payload.height, payload.segmentSec, payload.maxKbps,
+                           deadline=deadline, cancel=cancel)
+    except HTTPException:
+        shutil.rmtree(td_str, ignore_errors=True)
+        raise
+    except JobKilled as e:
+        shutil.rmtree(td_str, ignore_errors=True)
+        raise HTTPException(status_code=e.status, detail=str(e))
+    except Exception as e:
+        shutil.rmtree(td_str, ignore_errors=True)
+        raise HTTPException(status_code=500, detail=f"RENDERER_CRASH: {e}")
+
+    print(f"RANGE_STATS: job={payload.jobId} scenes={payload.start}-{payload.end} "
+          f"seconds={job.seconds:.1f} peak_rss_mb={job.peak_rss_mb:.1f}")
+    return FileResponse(job.value["mp4"], media_type="video/mp4",
+                        headers={"X-Scenes": json.dumps(job.value["scenes"])},
+                        background=BackgroundTask(shutil.rmtree, td_str, ignore_errors=True))
+
+def _kbps(nbytes: int, seconds: Optional[float]) -> Optional[float]:
+    return round(nbytes * 8 / seconds / 1000, 1) if seconds else None
+
+def _encoding_report(out_mp4: Path, scenes: List[dict], renditions: Dict[int, Path]) -> dict:
+    # bytes per scene are the muxed scene clips (video + audio) before the stream-copy concat
+    size = out_mp4.stat().st_size
+    seconds = sum(float(sc.get("duration") or 0) for sc in scenes)
+    return {
+        "bytes": size,
+        "kbps": _kbps(size, seconds),
+        "renditions": {str(h): {"bytes": p.stat().st_size, "kbps": _kbps(p.stat().st_size, seconds)}
+                       for h, p in sorted(renditions.items(), reverse=True)},
+        "scenes": [{"index": sc.get("index"), "type": sc.get("type"), "profile": sc.get("profile"),
+                    "bytes": sc.get("bytes"), "kbps": _kbps(sc.get("bytes") or 0, sc.get("duration"))}
+                   for sc in scenes],
+    }
+
+def _capture(payload: RenderPayload, td: Path, outcome: str, seconds: Optional[float], info: dict) -> Optional[Path]:
+    # best effort: a capture problem must never fail the job it describes
+    if not should_capture(payload.capture, seconds):
+        return None
+    settings = {
+        "ladder": payload.ladder(),
+        "output": payload.output or OUTPUT_MODE,
+        "segmentSec": HLS_SEGMENT_SEC,
+        "useManim": os.getenv("USE_MANIM", "1") == "1",
+        "paceMult": float(os.getenv("PACE_MULT", "1.0")),
+        "rasterTemplates": os.getenv("RASTER_TEMPLATES"),
+        "peers": len(RENDER_PEERS),
+        "encodePreset": ENCODE_PRESET,
+        "crfStill": ENCODE_PROFILES["still"]["crf"],
+        "crfAnimation": ENCODE_PROFILES["animation"]["crf"],
+        "target": payload.target.model_dump() if payload.target else None,
+    }
+    try:
+        archive = write_archive(td, payload.jobId, payload.model_dump(mode="json"),
+                                {"outcome": outcome, "seconds": seconds, "settings": settings, **info})
+    except Exception as e:
+        print(f"WARN: capture failed for {payload.jobId}: {e!r}")
+        return None
+    if archive:
+        print(f"CAPTURED: job={payload.jobId} archive={archive}")
+    return archive
+
+def _render_job(payload: RenderPayload, deadline: float, cancel: threading.Event):
     job_id = payload.jobId
     upload_url = str(payload.stream.uploadURL) if payload.stream.uploadURL else None
 
@@ -323,87 +802,104 @@ def render(payload: RenderPayload, authorization: Optional[str] = Header(None)):
         raise HTTPException(status_code=422, detail="stream.uploadURL missing")
 
     try:
-        # Preflight: HEAD first audio to catch expired signature
-        try:
-            first_audio = str(payload.assets.audioUrls[0])
-            r = requests.head(first_audio, timeout=10, allow_redirects=True)
-            if r.status_code != 200:
-                raise Fail(f"VALIDATION_ERROR: first audio HEAD {r.status_code}")
-        except requests.RequestException as e:
-            raise Fail(f"FETCH_ERROR: audio HEAD failed: {e}")
+        # Preflight: HEAD first audio to catch expired signature (a bundle is one GET anyway)
+        if payload.assets.audioUrls:
+            try:
+                first_audio = str(payload.assets.audioUrls[0])
+                r = requests.head(first_audio, timeout=10, allow_redirects=True)
+                if r.status_code != 200:
+                    raise Fail(f"VALIDATION_ERROR: first audio HEAD {r.status_code}")
+            except requests.RequestException as e:
+                raise Fail(f"FETCH_ERROR: audio HEAD failed: {e}")
 
         # everything happens inside this tempdir
         with tempfile.TemporaryDirectory() as td_str:
             td = Path(td_str)
 
-            # Download JSON assets
-            ev = nar = cx = syncp = None
-            for item in [
-                ("events", str(payload.assets.eventsUrl)),
-                ("narration", str(payload.assets.narrationUrl)),
-                ("complexity", str(payload.assets.complexityUrl)),
-                ("sync", str(payload.assets.syncUrl))
-            ]:
-                try:
-                    if not item:
-                        continue
-                    kind, url = item
-                    name = infer_asset_filename(url, default=f"{kind}.json")
-                    dest = td / name
-                    download(url, dest)
-                    if   kind == "events":     ev = dest
-                    elif kind == "narration":  nar = dest
-                    elif kind == "complexity": cx = dest
-                    elif kind == "sync":       syncp = dest
-                except Exception as e:
-                    print("WARN: JSON asset fetch failed:", url, e)
-
-            # Download per-scene audio
-            audio_files: List[Path] = []
-            for i, aurl in enumerate(payload.assets.audioUrls):
-                aurl = str(aurl)
-                name = infer_asset_filename(aurl, default=f"{i:03d}.mp3")
-                ext = Path(name).suffix or ".mp3"
-                p = td / f"{i:03d}{ext}"
-                download(aurl, p)
-                audio_files.append(p)
-
-            if not audio_files:
-                raise Fail("VALIDATION_ERROR: no audio files")
-
-            # Concat total audio (fallback only)
-            out_audio = td / "combined.m4a"
-            assemble_audio(audio_files, out_audio)
-
-            # Render (prefer Manim)
-            out_mp4 = td / "out.mp4"
+            # Download + render on a pooled worker process (memory-capped, recycled)
+            hls = LOCAL and (payload.output or OUTPUT_MODE) == "hls"
+            ladder = payload.ladder()
+            stage = wants_staging(payload.capture)
             try:
-                use_manim = os.getenv("USE_MANIM", "1") == "1" and ev and audio_files
-                if use_manim:
-                    render_manim(ev, audio_files, out_mp4, sync_json=syncp)
-                else:
-                    total = sum((ffprobe_duration(p) or 2.0) for p in audio_files)
-                    make_video(total, out_audio, out_mp4)
-            except Exception as e:
-                print("WARN: manim render failed, falling back:", e)
-                total = sum((ffprobe_duration(p) or 2.0) for p in audio_files)
-                make_video(total, out_audio, out_mp4)
+                job = pool.run(_produce_video, td_str, payload.assets.model_dump(mode="json"), hls,
+                               job_id, deadline, ladder, stage,
+                               payload.target.model_dump() if payload.target else None,
+                               deadline=deadline, cancel=cancel)
+            except JobDeadline:
+                if stage:  # the slowest jobs are the ones worth replaying
+                    _capture(payload, td, "deadline", None, {})
+                raise
+            out_mp4 = Path(job.value["mp4"])
+            renditions = {int(h): Path(p) for h, p in job.value["renditions"].items()}
+            peak_rss = round(job.peak_rss_mb, 1)
+            timings = {**job.value["timings"], "worker": round(job.seconds, 2)}
+            print(f"JOB_STATS: job={job_id} seconds={job.seconds:.1f} peak_rss_mb={peak_rss} timings={timings}")
+            captured = {"timings": timings, "scenes": job.value["scenes"], "peakRssMb": peak_rss,
+                        "maxKbps": job.value["maxKbps"]}
+            encoding = _encoding_report(out_mp4, job.value["scenes"], renditions)
+            print(f"ENCODE_STATS: job={job_id} bytes={encoding['bytes']} kbps={encoding['kbps']}")
 
             if LOCAL:
-                out_dir = Path(os.getenv("LOCAL_OUTPUT_DIR", "/output")); out_dir.mkdir(parents=True, exist_ok=True)
+                out_dir = OUTPUT_DIR; out_dir.mkdir(parents=True, exist_ok=True)
                 local_path = out_dir / f"{job_id}.mp4"
                 shutil.copy2(out_mp4, local_path)
-                return {"ok": True, "jobId": job_id, "localPath": str(local_path)}
-
-            # Upload to Stream (basic direct upload)
+                res = {"ok": True, "jobId": job_id, "localPath": str(local_path), "peakRssMb": peak_rss}
+                if len(renditions) > 1:
+                    res["renditions"] = {str(ladder[0]): str(local_path)}
+                    for h in ladder[1:]:
+                        p = out_dir / f"{job_id}_{h}p.mp4"
+                        shutil.copy2(renditions[h], p)
+                        res["renditions"][str(h)] = str(p)
+                if job.value["hls"]:
+                    # served by /files/{jobId}/index.m3u8; segments are relative to the playlist
+                    hls_out = out_dir / job_id
+                    if hls_out.resolve().parent != out_dir.resolve():
+                        raise Fail(f"VALIDATION_ERROR: jobId {job_id!r} is not a plain name")
+                    shutil.rmtree(hls_out, ignore_errors=True)
+                    shutil.copytree(job.value["hls"], hls_out)
+                    res["hls"] = {
+                        "playlistUrl": f"/files/{job_id}/index.m3u8",
+                        "chaptersUrl": f"/files/{job_id}/chapters.json",
+                        "localDir": str(hls_out),
+                    }
+                res["timings"] = timings
+                res["encoding"] = encoding
+                archive = _capture(payload, td, "done", job.seconds, captured)
+                if archive:
+                    res["capture"] = str(archive)
+                return res
+
+            # Upload to Stream (basic direct upload); all renditions in parallel
+            _check_job(cancel, deadline)
+            targets = {ladder[0]: upload_url}
+            extra_urls = payload.stream.renditionUploadURLs or {}
+            for h in ladder[1:]:
+                if str(h) in extra_urls:
+                    targets[h] = str(extra_urls[str(h)])
+                else:
+                    print(f"WARN: no upload URL for {h}p rendition of {job_id}; skipped")
+            up_timeout = max(5.0, min(300.0, deadline - time.monotonic()))
+            t_up = time.monotonic()
             try:
-                uid = basic_upload(upload_url, out_mp4)
+                with ThreadPoolExecutor(max_workers=len(targets)) as ex:
+                    futs = {h: ex.submit(basic_upload, u, renditions[h], up_timeout) for h, u in targets.items()}
+                    uids = {h: f.result() for h, f in futs.items()}
             except Exception as e:
                 raise Fail(f"UPLOAD_ERROR: {e}")
+            timings["upload"] = round(time.monotonic() - t_up, 2)
 
+            uid = uids[ladder[0]]
             playback = f"https://watch.cloudflarestream.com/{uid}"
             backend_callback(job_id, "done", "ok", uid, playback)
-            return {"ok": True, "jobId": job_id, "streamUid": uid, "playbackUrl": playback}
+            res = {"ok": True, "jobId": job_id, "streamUid": uid, "playbackUrl": playback, "peakRssMb": peak_rss,
+                   "timings": timings, "encoding": encoding}
+            if len(uids) > 1:
+                res["renditions"] = {str(h): {"streamUid": u, "playbackUrl": f"https://watch.cloudflarestream.com/{u}"}
+                                     for h, u in uids.items()}
+            archive = _capture(payload, td, "done", job.seconds + timings["upload"], captured)
+            if archive:
+                res["capture"] = str(archive)
+            return res
 
 
     except ValidationError as e:
@@ -413,6 +909,9 @@ def render(payload: RenderPayload, authorization: Optional[str] = Header(None)):
     except Fail as e:
         safe_callback(job_id, "failed", str(e))
         raise HTTPException(status_code=400, detail=str(e))
+    except JobKilled as e:
+        safe_callback(job_id, "failed", str(e))
+        raise HTTPException(status_code=e.status, detail=str(e))
     except Exception as e:
         safe_callback(job_id, "failed", f"RENDERER_CRASH: {e}")
         raise
@@ -1,20 +1,31 @@
 # renderer/app/manim_render.py
-import json, tempfile, gzip, shutil, subprocess, os
+import json, tempfile, gzip, shutil, subprocess, os, time
 from pathlib import Path
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Tuple
 from manim import tempconfig
 from .normalizer import normalize_events
 from .mapping import coerce_args, apply_manim_defaults
+from .templates.callout import Callout
+from .bundle import FFMPEG_WHITELIST, ffmpeg_path
+from .encoding import video_args, profile_for, scaled_kbps, AUDIO_KBPS
 
 MIN_SCENE = float(os.getenv("MIN_SCENE", "1.2"))
 TAIL_PAD  = float(os.getenv("TAIL_PAD", "0.25"))
 PACE_MULT = float(os.getenv("PACE_MULT", "1.0"))
+RENDER_HEIGHT = int(os.getenv("RENDER_HEIGHT", "720"))
 
-def _load_sync(sync_path: Path, scenes_count: int) -> dict:
-    if not sync_path.exists():
-        return {"pairs": [[i] for i in range(scenes_count)], "breath_gap_sec": 0.12}
-    with open(sync_path, "r") as f:
-        plan = json.load(f)
+def frame_size(height: int) -> Tuple[int, int]:
+    """16:9 frame for a given height, both sides even (yuv420p)."""
+    return (round(height * 16 / 9) // 2) * 2, (height // 2) * 2
+
+def _load_sync(sync_path: Path|bytes|None, scenes_count: int) -> dict:
+    if isinstance(sync_path, bytes):  # bundle member (see bundle.py)
+        plan = json.loads(sync_path)
+    elif not sync_path or not sync_path.is_file():
+        return {"pairs": [[i] for i in range(scenes_count)], "gap": 0.12}
+    else:
+        with open(sync_path, "r") as f:
+            plan = json.load(f)
     pairs = plan.get("pairs") or []
     if len(pairs) != scenes_count:
         # fallback: identity mapping
@@ -43,7 +54,7 @@ def _pad_audio_to(a_in: Path, a_out: Path, target_sec: float):
         ])
         shutil.move(merged, a_out)
 
-def _ffprobe_duration(p: Path) -> float:
+def _ffprobe_duration(p: Path | str) -> float:
     try:
         out = subprocess.check_output(
             ["ffprobe","-v","error","-show_entries","format=duration","-of","default=nk=1:nw=1", str(p)],
@@ -53,8 +64,8 @@ def _ffprobe_duration(p: Path) -> float:
     except Exception:
         return 2.0
 
-def _load_events_any(p: Path) -> List[Dict[str, Any]]:
-    b = p.read_bytes()
+def _load_events_any(p: Path|bytes) -> List[Dict[str, Any]]:
+    b = p if isinstance(p, bytes) else p.read_bytes()
     if len(b) >= 2 and b[:2] == b"\x1f\x8b":  # gz header
         b = gzip.decompress(b)
     text = b.decode("utf-8", errors="replace")
@@ -73,7 +84,14 @@ def _load_events_any(p: Path) -> List[Dict[str, Any]]:
         raise ValueError(f"events root must be list or object, got {type(obj)}")
     return obj
 
-def _render_scene(SceneCls, args: Dict[str,Any], duration: float, out_mp4: Path):
+def _render_scene(SceneCls, args: Dict[str,Any], duration: float, out_mp4: Path, height: int = RENDER_HEIGHT,
+                  encode: List[str] | None = None):
+    # encode: libx264 args from encoding.video_args; this is the clip's only video encode
+    encode = encode or video_args("animation")
+    if getattr(SceneCls, "backend", "manim") == "raster":
+        SceneCls(duration=duration, **args).render_to(out_mp4, height, encode)
+        return
+
     # inject duration into scene subclass
     class _Scene(SceneCls):
         def __init__(self, **kw):
@@ -81,34 +99,71 @@ def _render_scene(SceneCls, args: Dict[str,Any], duration: float, out_mp4: Path)
             super().__init__(duration=d, **kw)
 
     tmp = out_mp4.parent / f"{out_mp4.stem}_manim.mp4"
-    with tempconfig({"pixel_width":1280,"pixel_height":720,"frame_rate":30}):
+    # media_dir next to the clip: scratch stays inside the job dir and goes away with it
+    w, h = frame_size(height)
+    with tempconfig({"pixel_width":w,"pixel_height":h,"frame_rate":30,
+                     "media_dir":str(out_mp4.parent / "media")}):
         sc = _Scene(**args)
         sc.render()
         produced = sc.renderer.file_writer.movie_file_path
         shutil.move(produced, tmp)
 
+    # Manim's scene outlasts the narration (finish_with_wait pads); only the narrated part is kept
     subprocess.check_call([
-        "ffmpeg","-y","-i",str(tmp),
-        "-c:v","libx264","-pix_fmt","yuv420p","-an", str(out_mp4)
+        "ffmpeg","-y","-i",str(tmp),"-t",f"{duration * PACE_MULT:.3f}",
+        *encode,"-an", str(out_mp4)
     ])
 
 def _mux(video: Path, audio: Path, out_path: Path):
+    # video was encoded with its scene profile in _render_scene; only audio is encoded here
     subprocess.check_call([
         "ffmpeg","-y","-i",str(video),"-i",str(audio),
-        "-c:v","libx264","-pix_fmt","yuv420p","-c:a","aac","-shortest",
+        "-c:v","copy","-c:a","aac","-b:a",f"{AUDIO_KBPS}k","-shortest",
         str(out_path)
     ])
 
 def _concat(clips: List[Path], out_path: Path):
+    """
+    Join scene (or range) clips without re-encoding video: every clip shares the
+    stream settings of encoding.X264_COMMON and carries its own keyframes. Audio is
+    re-encoded so per-clip AAC priming doesn't accumulate into A/V drift.
+    """
     lst = out_path.with_suffix(".txt")
     with open(lst,"w") as f:
         for p in clips:
             f.write(f"file '{p.as_posix()}'\n")
     subprocess.check_call([
         "ffmpeg","-y","-f","concat","-safe","0","-i",str(lst),
-        "-c:v","libx264","-pix_fmt","yuv420p","-c:a","aac", str(out_path)
+        "-c:v","copy","-c:a","aac","-b:a",f"{AUDIO_KBPS}k","-movflags","+faststart", str(out_path)
     ])
 
+def encode_renditions(src: Path, heights: List[int], out_dir: Path, stem: str = "out",
+                      profile: str = "animation", max_kbps: int | None = None) -> Dict[int, Path]:
+    """
+    Derive lower renditions from an already-encoded top rendition in one ffmpeg
+    run: a single decode, split + scale per height, encodes in parallel threads,
+    audio stream-copied. src itself is the top (largest) rendition.
+    Each output uses `profile` (see encoding.dominant_profile) and max_kbps scaled
+    to its pixel count, so a lower rendition never outgrows the top one.
+    """
+    top, *rest = sorted(set(heights), reverse=True)
+    outs: Dict[int, Path] = {top: src}
+    if not rest:
+        return outs
+    n = len(rest)
+    graph = f"[0:v]split={n}" + "".join(f"[s{k}]" for k in range(n))
+    for k, h in enumerate(rest):
+        w, hh = frame_size(h)
+        graph += f";[s{k}]scale={w}:{hh}:flags=lanczos[v{k}]"
+    cmd = ["ffmpeg","-y","-i",str(src),"-filter_complex",graph]
+    for k, h in enumerate(rest):
+        out = out_dir / f"{stem}_{h}p.mp4"
+        cmd += ["-map",f"[v{k}]","-map","0:a?",*video_args(profile, max_kbps=scaled_kbps(max_kbps, h, top)),
+                "-c:a","copy","-movflags","+faststart",str(out)]
+        outs[h] = out
+    subprocess.check_call(cmd)
+    return outs
+
 def _synthesize_silence(seconds: float, out_audio: Path):
     # generate a tiny silence (stereo 48k) once per needed duration
     subprocess.check_call([
@@ -116,7 +171,7 @@ def _synthesize_silence(seconds: float, out_audio: Path):
         "-t",f"{seconds:.3f}","-c:a","aac","-b:a","160k", str(out_audio)
     ])
 
-def _concat_audios(audios: list[Path], gap_sec: float, out_audio: Path):
+def _concat_audios(audios: list[Path | str], gap_sec: float, out_audio: Path):
     # Create a concat list. If gap_sec > 0, insert synthetic silence between clips.
     items = []
     if not audios:
@@ -138,14 +193,36 @@ def _concat_audios(audios: list[Path], gap_sec: float, out_audio: Path):
     lst = out_audio.with_suffix(".concat.txt")
     with open(lst, "w") as f:
         for p in items:
-            f.write(f"file '{p.as_posix()}'\n")
+            f.write(f"file '{ffmpeg_path(p)}'\n")
 
+    # whitelist: line clips may be byte ranges of a job bundle
     subprocess.check_call([
-        "ffmpeg","-y","-f","concat","-safe","0","-i",str(lst),
+        "ffmpeg","-y","-f","concat","-safe","0",*FFMPEG_WHITELIST,"-i",str(lst),
         "-c:a","aac","-b:a","160k", str(out_audio)
     ])
 
-def render_manim(events_json: Path, audio_files: List[Path], out_mp4: Path, sync_json: Path|None=None):
+def count_scenes(events_json: Path|bytes) -> int:
+    """Number of scenes render_manim will produce for these events (sync pairs always match)."""
+    return len(normalize_events(_load_events_any(events_json)))
+
+def render_manim(events_json: Path|bytes, audio_files: List[Path|str], out_mp4: Path, sync_json: Path|bytes|None=None,
+                 segment_sec: float|None=None, scene_range: Tuple[int, int]|None=None,
+                 height: int = RENDER_HEIGHT, max_kbps: int|None = None) -> List[Dict[str, Any]]:
+    """
+    Render every scene to its own clip and concatenate into out_mp4.
+    Returns per-scene info: [{index, type, lines, seconds, profile, bytes, duration}, ...]
+    in timeline order; lines are the narration clips of the sync plan, seconds the
+    render time, profile/bytes the scene's encoding profile and clip size.
+    Each scene is encoded once with the profile of its template (encoding.py),
+    capped at max_kbps when given.
+    With segment_sec, out_mp4 gets keyframes at every scene boundary and every
+    segment_sec inside a scene (see hls.cut_times).
+    With scene_range=(start, end), only scenes start..end-1 are rendered
+    (distributed rendering; indices stay global).
+    height sets the raster size (16:9); lower renditions are scaled from it.
+    events_json/sync_json may also be raw bytes and audio_files subfile URLs
+    (job bundle members, see bundle.py).
+    """
     apply_manim_defaults()
 
     raw = _load_events_any(events_json)
@@ -153,13 +230,17 @@ def render_manim(events_json: Path, audio_files: List[Path], out_mp4: Path, sync
     events = normalize_events(raw)
 
     # --- NEW: sync plan
-    sync = _load_sync(sync_json or Path(""), len(events))
+    sync = _load_sync(sync_json, len(events))
     pairs, gap = sync["pairs"], sync["gap"]
+    lo, hi = scene_range if scene_range else (0, len(pairs))
 
     # build per-scene audio by concatenating line clips per pair
-    grouped_audio: List[Path] = []
+    grouped_audio: List[Path|None] = []
     scratch = out_mp4.parent
     for i, line_ids in enumerate(pairs):
+        if not lo <= i < hi:
+            grouped_audio.append(None)  # keeps indices aligned; never used
+            continue
         # map narration indices to local audio files (skip OOB safely)
         parts = [audio_files[j] for j in line_ids if 0 <= j < len(audio_files)]
         out_a = scratch / f"group_{i:03d}.m4a"
@@ -171,8 +252,12 @@ def render_manim(events_json: Path, audio_files: List[Path], out_mp4: Path, sync
         raise RuntimeError("no events/audio pairs")
 
     clips: List[Path] = []
+    scenes: List[Dict[str, Any]] = []
     ok = 0
     for i, (ev, aud) in enumerate(pairs2):
+        if not lo <= i < hi:
+            continue
+        t0 = time.monotonic()
         try:
             SceneCls, args = coerce_args(ev, events_root=root)
             a_dur = max(0.2, _ffprobe_duration(aud))
@@ -181,24 +266,34 @@ def render_manim(events_json: Path, audio_files: List[Path], out_mp4: Path, sync
             vid = out_mp4.parent / f"clip_{i:03d}.mp4"
             av  = out_mp4.parent / f"clip_{i:03d}_av.mp4"
 
-            _render_scene(SceneCls, args, d, vid)
+            profile = profile_for(ev.get("type"))
+            _render_scene(SceneCls, args, d, vid, height, video_args(profile, segment_sec, max_kbps))
 
             padded = aud.with_suffix(".padded.m4a")
             _pad_audio_to(aud, padded, d * PACE_MULT)
             _mux(vid, padded, av)
 
             clips.append(av); ok += 1
+            scenes.append({"index": i, "type": ev.get("type"), "lines": pairs[i],
+                           "seconds": round(time.monotonic() - t0, 2),
+                           "profile": profile, "bytes": av.stat().st_size})
         except Exception as e:
             print(f"WARN: scene {i} failed: {e}")
             d = max(MIN_SCENE, _ffprobe_duration(aud) + TAIL_PAD)
             vid = out_mp4.parent / f"clip_{i:03d}.mp4"
-            _render_scene(Callout, {"text": "Step"}, d, vid)
+            _render_scene(Callout, {"text": "Step"}, d, vid, height, video_args("still", segment_sec, max_kbps))
             padded = aud.with_suffix(".padded.m4a")
             _pad_audio_to(aud, padded, d)
             av = out_mp4.parent / f"clip_{i:03d}_av.mp4"
             _mux(vid, padded, av)
             clips.append(av)
+            scenes.append({"index": i, "type": "callout", "fallback": True, "lines": pairs[i],
+                           "seconds": round(time.monotonic() - t0, 2),
+                           "profile": "still", "bytes": av.stat().st_size})
 
     if ok == 0:
         raise RuntimeError("no scenes rendered")
+    for sc, clip in zip(scenes, clips):
+        sc["duration"] = _ffprobe_duration(clip)
     _concat(clips, out_mp4)
+    return scenes
@@ -1,3 +1,4 @@
+import os
 from typing import Any, Dict, Tuple, Type
 from manim import config
 from .templates.title_card import TitleCard
@@ -6,8 +7,14 @@ from .templates.array_tape import ArrayTape
 from .templates.callout import Callout
 from .templates.result_card import ResultCard
 from .templates.move_pointer import MovePointer
+from .raster import RasterMap
 
-SceneMap: Dict[str, Type] = {
+# templates drawn by the lightweight raster backend instead of Manim (default: Manim for all).
+# Opt a template in only once `python -m app.raster diff` passes for it: the raster cards
+# fade instead of Write() and set text with Pillow/DejaVu metrics rather than Pango.
+RASTER_TEMPLATES = [t.strip() for t in os.getenv("RASTER_TEMPLATES", "").split(",") if t.strip()]
+
+ManimMap: Dict[str, Type] = {
     "title_card": TitleCard,
     "complexity_card": ComplexityCard,
     "array_tape": ArrayTape,
@@ -16,12 +23,14 @@ SceneMap: Dict[str, Type] = {
     "move_pointer": MovePointer,   
 }
 
+SceneMap: Dict[str, Type] = {**ManimMap, **{k: RasterMap[k] for k in RASTER_TEMPLATES if k in RasterMap}}
+
 
-def coerce_args(event: Dict[str, Any]) -> Tuple[type, Dict[str, Any]]:
+def coerce_args(event: Dict[str, Any], events_root: Dict[str, Any] | None = None) -> Tuple[type, Dict[str, Any]]:
     etype = event.get("type")
-    SceneCls = SceneMap.get(etype, TitleCard)
+    SceneCls = SceneMap.get(etype, SceneMap["title_card"])
     args = event.get("args") or {}
-    if SceneCls is TitleCard:
+    if SceneCls is SceneMap["title_card"]:
         args.setdefault("title", event.get("title") or "Algorithm")
         args.setdefault("subtitle", event.get("subtitle") or "")
     return SceneCls, args
@@ -0,0 +1,258 @@
+# renderer/app/raster.py
+"""
+Lightweight backend for the static card templates (TitleCard, Callout,
+ResultCard, ComplexityCard): each element is drawn once with Pillow onto a
+transparent full-frame layer, and ffmpeg fades/moves the layers over a black
+background with the same layout and timings as the Manim templates. No Scene,
+cairo renderer or movie writer is involved.
+
+Opt templates in per deployment with RASTER_TEMPLATES (see mapping.SceneMap;
+the default is Manim everywhere) after checking fidelity against Manim with:
+
+    python -m app.raster diff [--height 720] [--min-ssim 0.9]
+"""
+import argparse, json, os, re, subprocess, sys, tempfile, time
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+from PIL import Image, ImageDraw, ImageFont
+
+_PACE = float(os.getenv("PACE_MULT", "1.0"))
+FPS = 30
+
+# Manim geometry: frame is 8 units tall, 16:9; Text em = font_size/960 of frame width (font_size 48 default)
+FRAME_H_UNITS = 8.0
+WHITE = (255, 255, 255, 255)
+YELLOW = (0xF7, 0xD9, 0x6F, 255)  # manim YELLOW (YELLOW_C)
+STROKE_PX_PER_WIDTH = 0.01        # manim stroke_width 1 ≈ 0.01 units
+
+FONT_DIRS = [Path("/usr/share/fonts/truetype/dejavu"), Path("/usr/share/fonts/dejavu")]
+FONT_FILES = {False: "DejaVuSans.ttf", True: "DejaVuSans-Bold.ttf"}
+
+
+def _font(px: int, bold: bool) -> ImageFont.ImageFont:
+    for d in FONT_DIRS:
+        p = d / FONT_FILES[bold]
+        if p.exists():
+            return ImageFont.truetype(str(p), px)
+    return ImageFont.load_default(px)
+
+
+class _Canvas:
+    """Unit <-> pixel mapping for one frame size (origin at centre, y up)."""
+    def __init__(self, height: int):
+        self.h = (height // 2) * 2
+        self.w = (round(height * 16 / 9) // 2) * 2
+        self.ppu = self.h / FRAME_H_UNITS
+
+    def px(self, x: float, y: float) -> Tuple[float, float]:
+        return self.w / 2 + x * self.ppu, self.h / 2 - y * self.ppu
+
+    def layer(self) -> Image.Image:
+        return Image.new("RGBA", (self.w, self.h), (0, 0, 0, 0))
+
+    def text_size(self, text: str, scale: float, bold: bool) -> Tuple[float, float, ImageFont.ImageFont]:
+        """Ink width/height in units for a Text(text).scale(scale)."""
+        font = _font(max(1, round(48 * scale * self.w / 960)), bold)
+        l, t, r, b = font.getbbox(text or " ")
+        return (r - l) / self.ppu, (b - t) / self.ppu, font
+
+    def draw_text(self, img: Image.Image, text: str, scale: float, bold: bool, cy: float, fill=WHITE):
+        _, _, font = self.text_size(text, scale, bold)
+        cx, cyp = self.px(0, cy)
+        ImageDraw.Draw(img).text((cx, cyp), text, font=font, fill=fill, anchor="mm")
+
+    def draw_box(self, img: Image.Image, width: float, height: float, cy: float,
+                 color=WHITE, stroke: float = 4, radius: float = 0.2):
+        x0, y0 = self.px(-width / 2, cy + height / 2)
+        x1, y1 = self.px(width / 2, cy - height / 2)
+        ImageDraw.Draw(img).rounded_rectangle(
+            [x0, y0, x1, y1], radius=radius * self.ppu, outline=color,
+            width=max(1, round(stroke * STROKE_PX_PER_WIDTH * self.ppu)))
+
+
+def _stack(heights: List[float], buff: float) -> List[float]:
+    """Centres (y, units) of items arranged DOWN with `buff`, group centred on the origin."""
+    total = sum(heights) + buff * (len(heights) - 1)
+    y, out = total / 2, []
+    for h in heights:
+        out.append(y - h / 2)
+        y -= h + buff
+    return out
+
+
+class RasterCard:
+    """
+    Base for raster templates. Subclasses implement layers() returning
+    [(image, fade_start, fade_duration, shift_up_units)] in draw order.
+    Same constructor shape as the Manim templates: duration + template args.
+    """
+    backend = "raster"
+
+    def __init__(self, duration: float = 2.0, **kwargs):
+        self.duration = float(duration)
+
+    def layers(self, cv: _Canvas) -> List[Tuple[Image.Image, float, float, float]]:
+        raise NotImplementedError
+
+    def render_to(self, out_mp4: Path, height: int = 720, encode_args: Optional[List[str]] = None):
+        cv = _Canvas(height)
+        dur = max(0.1, self.duration * _PACE)
+        work = out_mp4.parent / f"{out_mp4.stem}_layers"
+        work.mkdir(parents=True, exist_ok=True)
+
+        cmd = ["ffmpeg", "-y", "-f", "lavfi", "-i", f"color=c=black:s={cv.w}x{cv.h}:r={FPS}:d={dur:.3f}"]
+        graph, last = [], "0:v"
+        for k, (img, start, fade, shift) in enumerate(self.layers(cv), start=1):
+            p = work / f"layer_{k}.png"
+            img.save(p)
+            cmd += ["-loop", "1", "-framerate", str(FPS), "-t", f"{dur:.3f}", "-i", str(p)]
+            graph.append(f"[{k}:v]format=rgba,fade=t=in:st={start:.3f}:d={fade:.3f}:alpha=1[l{k}]")
+            y = "0"
+            if shift:
+                dy = shift * cv.ppu  # FadeIn(shift=UP*s): starts s lower, rises while fading
+                y = f"'if(lt(t,{start:.3f}),{dy:.2f},if(lt(t,{start + fade:.3f}),{dy:.2f}*(1-(t-{start:.3f})/{fade:.3f}),0))'"
+            graph.append(f"[{last}][l{k}]overlay=x=0:y={y}:shortest=1[o{k}]")
+            last = f"o{k}"
+        graph.append(f"[{last}]format=yuv420p[v]")
+        cmd += ["-filter_complex", ";".join(graph), "-map", "[v]", "-r", str(FPS),
+                *(encode_args or ["-c:v", "libx264", "-pix_fmt", "yuv420p"]), "-an", str(out_mp4)]
+        subprocess.check_call(cmd)
+
+
+def _single(cv: _Canvas, draw) -> Image.Image:
+    img = cv.layer()
+    draw(img)
+    return img
+
+
+class RasterTitleCard(RasterCard):
+    def __init__(self, duration: float = 2.0, title="Algorithm", subtitle="", **kwargs):
+        super().__init__(duration)
+        self.title, self.subtitle = title, subtitle
+
+    def layers(self, cv):
+        _, th, _ = cv.text_size(self.title, 1.2, True)
+        if not self.subtitle:
+            return [(_single(cv, lambda im: cv.draw_text(im, self.title, 1.2, True, 0.0)), 0.0, 0.5, 0.0)]
+        _, sh, _ = cv.text_size(self.subtitle, 0.7, False)
+        ty, sy = _stack([th, sh], 0.4)
+        return [
+            (_single(cv, lambda im: cv.draw_text(im, self.title, 1.2, True, ty)), 0.0, 0.5, 0.0),
+            (_single(cv, lambda im: cv.draw_text(im, self.subtitle, 0.7, False, sy)), 0.5, 0.4, 0.2),
+        ]
+
+
+class RasterCallout(RasterCard):
+    def __init__(self, duration: float = 2.0, text="Note", **kwargs):
+        super().__init__(duration)
+        self.text = text
+
+    def layers(self, cv):
+        return [
+            (_single(cv, lambda im: cv.draw_box(im, 8, 1.4, 0.0, color=YELLOW, stroke=3)), 0.0, 0.2, 0.0),
+            (_single(cv, lambda im: cv.draw_text(im, self.text, 0.6, False, 0.0)), 0.2, 0.5, 0.0),
+        ]
+
+
+class RasterResultCard(RasterCard):
+    def __init__(self, duration: float = 2.0, text="Result", **kwargs):
+        super().__init__(duration)
+        self.text = text
+
+    def layers(self, cv):
+        # same arrangement as templates/result_card.py: box, title, body stacked downwards
+        _, th, _ = cv.text_size("Result", 0.9, True)
+        _, bh, _ = cv.text_size(self.text, 0.7, False)
+        by, ty, yy = _stack([2.2, th, bh], 0.3)
+        return [
+            (_single(cv, lambda im: cv.draw_box(im, 8, 2.2, by)), 0.0, 0.2, 0.0),
+            (_single(cv, lambda im: cv.draw_text(im, "Result", 0.9, True, ty)), 0.2, 0.3, 0.0),
+            (_single(cv, lambda im: cv.draw_text(im, self.text, 0.7, False, yy)), 0.5, 0.4, 0.0),
+        ]
+
+
+class RasterComplexityCard(RasterCard):
+    def __init__(self, duration: float = 2.0, time_complexity="O(n)", space_complexity="O(1)", **kwargs):
+        super().__init__(duration)
+        self.tc, self.sc = time_complexity, space_complexity
+
+    def layers(self, cv):
+        tc, sc = f"Time: {self.tc}", f"Space: {self.sc}"
+        hs = [cv.text_size("Complexity", 0.9, True)[1], cv.text_size(tc, 1.0, False)[1], cv.text_size(sc, 1.0, False)[1]]
+        y0, y1, y2 = _stack(hs, 0.3)
+
+        def both(im):
+            cv.draw_text(im, tc, 1.0, False, y1)
+            cv.draw_text(im, sc, 1.0, False, y2)
+
+        return [
+            (_single(cv, lambda im: cv.draw_box(im, 8, 3, 0.0)), 0.0, 0.3, 0.0),
+            (_single(cv, lambda im: cv.draw_text(im, "Complexity", 0.9, True, y0)), 0.3, 0.3, 0.0),
+            (_single(cv, both), 0.6, 0.4, 0.0),
+        ]
+
+
+RasterMap: Dict[str, type] = {
+    "title_card": RasterTitleCard,
+    "callout": RasterCallout,
+    "result_card": RasterResultCard,
+    "complexity_card": RasterComplexityCard,
+}
+
+
+# --------------------------------------------------------------------------------------
+# Visual diff against the Manim templates
+# --------------------------------------------------------------------------------------
+SAMPLES: Dict[str, Dict[str, Any]] = {
+    "title_card": {"title": "Binary Search (Rotated)", "subtitle": "Two pointers"},
+    "callout": {"text": "Left half is sorted"},
+    "result_card": {"text": "Found at index 4"},
+    "complexity_card": {"time_complexity": "O(log n)", "space_complexity": "O(1)"},
+}
+
+def _ssim(a: Path, b: Path) -> Tuple[float, float]:
+    # per-frame SSIM/PSNR averaged over the clip (the shorter one bounds the comparison)
+    r = subprocess.run(["ffmpeg", "-i", str(a), "-i", str(b), "-lavfi", "[0:v][1:v]ssim;[0:v][1:v]psnr", "-f", "null", "-"],
+                       capture_output=True, text=True)
+    ssim = re.search(r"SSIM .*All:([\d.]+)", r.stderr)
+    psnr = re.search(r"PSNR .*average:([\d.inf]+)", r.stderr)
+    return (float(ssim.group(1)) if ssim else 0.0,
+            float(psnr.group(1)) if psnr and psnr.group(1) != "inf" else float("inf"))
+
+def diff(height: int, duration: float, min_ssim: float) -> int:
+    # imported here: the raster path itself must not pull in Manim
+    from .mapping import ManimMap, apply_manim_defaults
+    from .manim_render import _render_scene
+
+    apply_manim_defaults()
+    report, worst = [], 1.0
+    with tempfile.TemporaryDirectory() as td:
+        for name, args in SAMPLES.items():
+            a, b = Path(td) / f"{name}_manim.mp4", Path(td) / f"{name}_raster.mp4"
+            t0 = time.monotonic()
+            _render_scene(ManimMap[name], dict(args), duration, a, height)
+            t1 = time.monotonic()
+            RasterMap[name](duration=duration, **args).render_to(b, height)
+            t2 = time.monotonic()
+            ssim, psnr = _ssim(a, b)
+            worst = min(worst, ssim)
+            report.append({"template": name, "ssim": round(ssim, 4), "psnr": round(psnr, 2),
+                           "manimSec": round(t1 - t0, 2), "rasterSec": round(t2 - t1, 2),
+                           "speedup": round((t1 - t0) / max(t2 - t1, 1e-6), 1)})
+    print(json.dumps(report, indent=2))
+    return 0 if worst >= min_ssim else 1
+
+def main(argv: Optional[List[str]] = None) -> int:
+    ap = argparse.ArgumentParser(prog="python -m app.raster")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    d = sub.add_parser("diff", help="render sample cards with both backends and compare")
+    d.add_argument("--height", type=int, default=720)
+    d.add_argument("--duration", type=float, default=2.5)
+    d.add_argument("--min-ssim", type=float, default=0.90)
+    args = ap.parse_args(argv)
+    return diff(args.height, args.duration, args.min_ssim)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,263 @@
+# renderer/app/worker.py
+import os, signal, threading, time, traceback
+import multiprocessing as mp
+from dataclasses import dataclass
+from typing import Any, Callable, List, Optional
+
+RENDER_WORKERS      = int(os.getenv("RENDER_WORKERS", "2"))
+WORKER_MAX_JOBS     = int(os.getenv("WORKER_MAX_JOBS", "25"))          # recycle after N jobs (0 = never)
+WORKER_RSS_HWM_MB   = float(os.getenv("WORKER_RSS_HWM_MB", "1200"))    # recycle when idle RSS is above this (0 = off)
+JOB_RSS_LIMIT_MB    = float(os.getenv("JOB_RSS_LIMIT_MB", "3072"))     # hard per-job ceiling, worker + children (0 = off)
+RSS_POLL_SEC        = float(os.getenv("RSS_POLL_SEC", "0.25"))
+WORKER_START_METHOD = os.getenv("WORKER_START_METHOD", "spawn")        # fork is unsafe under uvicorn threads
+
+_PAGE = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
+
+
+class JobKilled(RuntimeError):  # the worker running the job was killed or died underneath it
+    status = 500
+
+class JobCancelled(JobKilled):
+    status = 409
+
+class JobDeadline(JobKilled):
+    status = 504
+
+
+# --------------------------------------------------------------------------------------
+# /proc helpers (Linux only; everything degrades to 0 elsewhere)
+# --------------------------------------------------------------------------------------
+def _session_of(pid: int) -> Optional[int]:
+    try:
+        with open(f"/proc/{pid}/stat", "rb") as f:
+            stat = f.read().decode(errors="replace")
+        # comm may contain spaces/parens: fields after the last ')' are stable
+        fields = stat[stat.rfind(")") + 2:].split()
+        return int(fields[3])  # state, ppid, pgrp, session
+    except Exception:
+        return None
+
+def _rss_bytes(pid: int) -> int:
+    try:
+        with open(f"/proc/{pid}/statm", "rb") as f:
+            return int(f.read().split()[1]) * _PAGE
+    except Exception:
+        return 0
+
+def session_pids(sid: int) -> List[int]:
+    """All live pids in the session led by `sid` (the worker and every ffmpeg it spawned)."""
+    out = []
+    try:
+        names = os.listdir("/proc")
+    except Exception:
+        return [sid]
+    for name in names:
+        if name.isdigit() and _session_of(int(name)) == sid:
+            out.append(int(name))
+    return out or [sid]
+
+def tree_rss_mb(sid: int) -> float:
+    return sum(_rss_bytes(p) for p in session_pids(sid)) / (1024 * 1024)
+
+
+# --------------------------------------------------------------------------------------
+# Child side
+# --------------------------------------------------------------------------------------
+def _child_main(conn):
+    # own session → the parent can kill this worker and all of its subprocesses at once
+    try:
+        os.setsid()
+    except Exception:
+        pass
+    while True:
+        try:
+            msg = conn.recv()
+        except EOFError:
+            break
+        if msg is None:
+            break
+        fn, args = msg
+        try:
+            res = fn(*args)
+            conn.send(("ok", res))
+        except BaseException as e:
+            traceback.print_exc()
+            try:
+                conn.send(("err", e))
+            except Exception:
+                # unpicklable exception: keep the message, lose the type
+                conn.send(("err", RuntimeError(f"{type(e).__name__}: {e}")))
+
+
+# --------------------------------------------------------------------------------------
+# Parent side
+# --------------------------------------------------------------------------------------
+@dataclass
+class JobResult:
+    value: Any
+    peak_rss_mb: float
+    seconds: float
+
+
+class Worker:
+    def __init__(self, ctx):
+        self.conn, child = ctx.Pipe()
+        self.proc = ctx.Process(target=_child_main, args=(child,), daemon=True)
+        self.proc.start()
+        child.close()
+        self.jobs = 0
+
+    @property
+    def pid(self) -> int:
+        return self.proc.pid
+
+    def alive(self) -> bool:
+        return self.proc.is_alive()
+
+    def rss_mb(self) -> float:
+        return tree_rss_mb(self.pid)
+
+    def kill(self):
+        try:
+            os.killpg(self.pid, signal.SIGKILL)
+        except Exception:
+            try: self.proc.kill()
+            except Exception: pass
+        self.proc.join(timeout=5)
+        self.conn.close()
+
+    def stop(self):
+        try:
+            self.conn.send(None)
+            self.proc.join(timeout=5)
+        except Exception:
+            pass
+        if self.proc.is_alive():
+            self.kill()
+        else:
+            self.conn.close()
+
+    def _died(self) -> JobKilled:
+        # exitcode is only set once the process is reaped; a live process behind a broken pipe is useless too
+        self.proc.join(timeout=2)
+        if self.proc.is_alive():
+            self.kill()
+        return JobKilled(f"RENDERER_CRASH: worker {self.pid} exited (code {self.proc.exitcode})")
+
+    def run(self, fn: Callable, args: tuple, rss_limit_mb: float,
+            deadline: Optional[float] = None, cancel: Optional[threading.Event] = None) -> JobResult:
+        self.jobs += 1
+        t0 = time.monotonic()
+        peak = 0.0
+        try:
+            self.conn.send((fn, args))
+        except OSError:  # idle worker died since its last job (BrokenPipeError, ConnectionResetError)
+            raise self._died()
+        while True:
+            try:
+                ready = self.conn.poll(RSS_POLL_SEC)
+                if ready:
+                    kind, val = self.conn.recv()
+            except (EOFError, OSError):  # e.g. ConnectionResetError when it dies during spawn bootstrap
+                raise self._died()
+            if ready:
+                peak = max(peak, self.rss_mb())
+                if kind == "err":
+                    raise val
+                return JobResult(val, peak, time.monotonic() - t0)
+
+            if not self.proc.is_alive():
+                raise self._died()
+
+            rss = self.rss_mb()
+            peak = max(peak, rss)
+            if rss_limit_mb and rss > rss_limit_mb:
+                self.kill()
+                raise JobKilled(f"RENDERER_CRASH: job memory {rss:.0f}MB exceeded limit {rss_limit_mb:.0f}MB")
+            if cancel is not None and cancel.is_set():
+                self.kill()
+                raise JobCancelled("CANCELLED: job cancelled")
+            if deadline is not None and time.monotonic() > deadline:
+                self.kill()
+                raise JobDeadline(f"DEADLINE_EXCEEDED: render still running after {time.monotonic() - t0:.0f}s")
+
+
+class WorkerPool:
+    """
+    Fixed number of long-lived render processes. Workers are recycled after
+    WORKER_MAX_JOBS jobs or once their resident set stays above WORKER_RSS_HWM_MB
+    between jobs (Manim/cairo/Pango never give memory back).
+    """
+    def __init__(self, size: int = RENDER_WORKERS):
+        self.size = max(1, size)
+        self._ctx = mp.get_context(WORKER_START_METHOD)
+        self._slots = threading.BoundedSemaphore(self.size)
+        self._idle: List[Worker] = []
+        self._lock = threading.Lock()
+        self.recycled = 0
+
+    def _acquire(self, deadline: Optional[float] = None, cancel: Optional[threading.Event] = None) -> Worker:
+        # wait for a free slot, but give up as soon as the job is cancelled or out of time
+        while not self._slots.acquire(timeout=RSS_POLL_SEC):
+            if cancel is not None and cancel.is_set():
+                raise JobCancelled("CANCELLED: job cancelled while queued")
+            if deadline is not None and time.monotonic() > deadline:
+                raise JobDeadline("DEADLINE_EXCEEDED: no free render worker before deadline")
+        try:
+            with self._lock:
+                while self._idle:
+                    w = self._idle.pop()
+                    if w.alive():
+                        return w
+            return Worker(self._ctx)
+        except Exception:
+            self._slots.release()
+            raise
+
+    def _release(self, w: Worker):
+        try:
+            reason = None
+            if not w.alive():
+                reason = "dead"
+            elif WORKER_MAX_JOBS and w.jobs >= WORKER_MAX_JOBS:
+                reason = f"{w.jobs} jobs"
+            else:
+                rss = w.rss_mb()
+                if WORKER_RSS_HWM_MB and rss > WORKER_RSS_HWM_MB:
+                    reason = f"rss {rss:.0f}MB"
+            if reason:
+                print(f"WORKER_RECYCLE: pid={w.pid} reason={reason}")
+                w.stop()
+                with self._lock:
+                    self.recycled += 1
+            else:
+                with self._lock:
+                    self._idle.append(w)
+        finally:
+            self._slots.release()
+
+    def run(self, fn: Callable, *args, rss_limit_mb: float = JOB_RSS_LIMIT_MB,
+            deadline: Optional[float] = None, cancel: Optional[threading.Event] = None) -> JobResult:
+        """
+        Run fn(*args) on a worker process. fn and args must be picklable.
+        `deadline` is a time.monotonic() value; past it, or once `cancel` is set,
+        the worker and its whole process tree are killed.
+        """
+        w = self._acquire(deadline, cancel)
+        try:
+            return w.run(fn, args, rss_limit_mb, deadline, cancel)
+        finally:
+            self._release(w)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"size": self.size, "idle": len(self._idle), "recycled": self.recycled}
+
+    def shutdown(self):
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for w in idle:
+            w.stop()
+
+
+pool = WorkerPool()
@@ -0,0 +1,6 @@
+# renderer/tests/conftest.py
+import sys
+from pathlib import Path
+
+# the tests import `app` as the renderer does; make that work from any cwd
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
@@ -0,0 +1,65 @@
+import io, os
+
+from app.asset_cache import AssetCache
+
+
+def _cache(tmp_path, max_bytes=1 << 20, scan_sec=60.0):
+    return AssetCache(str(tmp_path / "cache"), max_bytes, scan_sec)
+
+
+def test_store_then_lookup_by_etag(tmp_path):
+    c = _cache(tmp_path)
+    dest = tmp_path / "job1" / "000.mp3"
+    dest.parent.mkdir()
+    c.store(io.BytesIO(b"audio-1"), "jobs/1/000.mp3", '"abc"', dest)
+    assert dest.read_bytes() == b"audio-1"
+
+    # same content under another job's key: served by ETag
+    hit = c.lookup("jobs/2/000.mp3", '"abc"')
+    assert hit is not None and hit.read_bytes() == b"audio-1"
+    dest2 = tmp_path / "job2.mp3"
+    assert c.link_into(hit, dest2)
+    assert dest2.read_bytes() == b"audio-1"
+
+
+def test_no_validator_never_hits(tmp_path):
+    c = _cache(tmp_path)
+    c.store(io.BytesIO(b"OLD"), "jobs/1/000.mp3", None, tmp_path / "a.mp3")
+    assert c.lookup("jobs/1/000.mp3", None) is None
+
+    c.store(io.BytesIO(b"OLD"), "jobs/1/001.mp3", 'W/"weak"', tmp_path / "b.mp3")
+    assert c.lookup("jobs/1/001.mp3", 'W/"weak"') is None
+
+    # regenerated audio under the same key comes through, not the old blob
+    c.store(io.BytesIO(b"NEW"), "jobs/1/000.mp3", None, tmp_path / "a.mp3")
+    assert (tmp_path / "a.mp3").read_bytes() == b"NEW"
+
+
+def test_evict_least_recently_used(tmp_path):
+    c = _cache(tmp_path, max_bytes=10)
+    for k, body in enumerate([b"aaaaaa", b"bbbbbb", b"cccccc"]):
+        c.store(io.BytesIO(body), f"k{k}", f'"e{k}"', tmp_path / f"{k}.bin")
+        os.utime(c.lookup(f"k{k}", f'"e{k}"'), (1000 + k, 1000 + k))
+    c.evict()
+    assert c.lookup("k0", '"e0"') is None
+    assert c.lookup("k1", '"e1"') is None
+    assert c.lookup("k2", '"e2"').read_bytes() == b"cccccc"
+    assert c.stats()["bytes"] == 6
+    # the job's own hard link survives eviction of the cache entry
+    assert (tmp_path / "0.bin").read_bytes() == b"aaaaaa"
+
+
+def test_store_scans_only_when_over_budget(tmp_path, monkeypatch):
+    c = _cache(tmp_path, max_bytes=100)
+    scans = []
+    real = c.evict
+    monkeypatch.setattr(c, "evict", lambda: (scans.append(1), real()))
+
+    for k in range(5):
+        c.store(io.BytesIO(b"x" * 10 + bytes([k])), f"k{k}", f'"e{k}"', tmp_path / f"{k}.bin")
+    assert len(scans) == 1  # first store seeds the estimate; the rest only add to it
+
+    for k in range(5, 10):
+        c.store(io.BytesIO(b"y" * 30 + bytes([k])), f"k{k}", f'"e{k}"', tmp_path / f"{k}.bin")
+    assert len(scans) > 1
+    assert c.stats()["bytes"] <= 100
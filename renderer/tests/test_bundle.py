@@ -0,0 +1,94 @@
+import io, json, os, tarfile, zipfile
+
+import pytest
+
+from app.bundle import Bundle, BundleError, ffmpeg_path
+
+MEMBERS = {
+    "events.json": b'{"events": []}',
+    "sync.json": b'{"pairs": [[0]]}',
+    "audio/001.wav": b"RIFF-second-clip",
+    "audio/000.mp3": b"ID3-first-clip-bytes",
+}
+
+
+def _tar(path, members, mode="w:", prefix=""):
+    with tarfile.open(path, mode) as tf:
+        for name, data in members.items():
+            info = tarfile.TarInfo(prefix + name)
+            info.size = len(data)
+            tf.addfile(info, io.BytesIO(data))
+    return path
+
+
+def _zip(path, members, compression=zipfile.ZIP_STORED):
+    with zipfile.ZipFile(path, "w", compression=compression) as zf:
+        for name, data in members.items():
+            info = zipfile.ZipInfo(name)
+            info.compress_type = compression
+            info.extra = b"\xfe\xca\x04\x00abcd"  # local header longer than name + 30
+            zf.writestr(info, data)
+    return path
+
+
+def _range(b: Bundle, name: str) -> bytes:
+    # what ffmpeg's subfile protocol would read
+    spec, path = b.ffmpeg_input(name).split(",,:", 1)
+    parts = spec.split(",")
+    start, end = int(parts[parts.index("start") + 1]), int(parts[parts.index("end") + 1])
+    with open(path, "rb") as f:
+        f.seek(start)
+        return f.read(end - start)
+
+
+@pytest.mark.parametrize("make", [
+    lambda p: _tar(p, MEMBERS),
+    lambda p: _tar(p, MEMBERS, prefix="./"),
+    lambda p: _zip(p, MEMBERS),
+])
+def test_member_offsets(tmp_path, make):
+    path = make(tmp_path / "bundle")
+    with Bundle(path) as b:
+        for name, data in MEMBERS.items():
+            assert b.read(name) == data
+            assert _range(b, name) == data
+        assert b.find("events") == "events.json"
+        assert b.find("complexity") is None
+        assert b.audio_members() == ["audio/000.mp3", "audio/001.wav"]
+        b.copy_member("audio/001.wav", tmp_path / "out.wav")
+        assert (tmp_path / "out.wav").read_bytes() == MEMBERS["audio/001.wav"]
+
+
+def test_index_orders_audio(tmp_path):
+    index = {"audio": ["audio/001.wav", "audio/000.mp3"]}
+    path = _tar(tmp_path / "bundle", {**MEMBERS, "index.json": json.dumps(index).encode()})
+    with Bundle(path) as b:
+        assert b.audio_members() == index["audio"]
+
+    path = _tar(tmp_path / "bad", {**MEMBERS, "index.json": b'{"audio": ["audio/missing.wav"]}'})
+    with Bundle(path) as b, pytest.raises(BundleError):
+        b.audio_members()
+
+
+def _open_fds() -> int:
+    return len(os.listdir("/proc/self/fd"))
+
+
+@pytest.mark.parametrize("make", [
+    lambda p: _tar(p, MEMBERS, mode="w:gz"),
+    lambda p: _zip(p, MEMBERS, compression=zipfile.ZIP_DEFLATED),
+    lambda p: (p.write_bytes(b"not a bundle" * 100), p)[1],
+    lambda p: (p.write_bytes(b""), p)[1],
+])
+def test_rejected_bundles_release_the_file(tmp_path, make):
+    path = make(tmp_path / "bundle")
+    before = _open_fds()
+    with pytest.raises(BundleError):
+        Bundle(path)
+    assert _open_fds() == before
+
+
+def test_ffmpeg_path():
+    from pathlib import Path
+    assert ffmpeg_path(Path("/tmp/a b.wav")) == "/tmp/a b.wav"
+    assert ffmpeg_path("subfile,,start,1,end,2,,:/tmp/x") == "subfile,,start,1,end,2,,:/tmp/x"
@@ -0,0 +1,34 @@
+import io, tarfile
+from pathlib import Path
+
+from app.bundle import Bundle
+from app.capture import stage_inputs
+
+
+def test_stage_inputs_keeps_every_downloaded_json(tmp_path):
+    for name in ("events.json", "sync.json", "narration.json", "complexity.json", "000.mp3"):
+        (tmp_path / name).write_bytes(name.encode())
+    out = stage_inputs(tmp_path, tmp_path / "events.json", tmp_path / "sync.json", [tmp_path / "000.mp3"],
+                       extra={"narration": tmp_path / "narration.json", "complexity": tmp_path / "complexity.json"})
+    for name in ("events.json", "sync.json", "narration.json", "complexity.json", "audio/000.mp3"):
+        assert (out / name).read_bytes() == Path(name).name.encode()
+
+
+def test_stage_inputs_from_bundle(tmp_path):
+    members = {"events.json": b"{}", "narration.json": b'{"n": 1}', "complexity.json": b'{"c": 1}',
+               "audio/000.wav": b"RIFF-clip"}
+    bundle = tmp_path / "bundle"
+    with tarfile.open(bundle, "w:") as tf:
+        for name, data in members.items():
+            info = tarfile.TarInfo(name)
+            info.size = len(data)
+            tf.addfile(info, io.BytesIO(data))
+    with Bundle(bundle) as b:
+        ev = b.read(b.find("events"))
+        extra = {k: b.read(b.find(k)) for k in ("narration", "complexity") if b.find(k)}
+        audio = [b.ffmpeg_input(n) for n in b.audio_members()]
+    out = stage_inputs(tmp_path, ev, None, audio, bundle=bundle, extra=extra)
+    assert (out / "narration.json").read_bytes() == b'{"n": 1}'
+    assert (out / "complexity.json").read_bytes() == b'{"c": 1}'
+    assert (out / "audio" / "000.wav").read_bytes() == b"RIFF-clip"
+    assert not (out / "sync.json").exists()
@@ -0,0 +1,47 @@
+import json, shutil, subprocess
+
+import pytest
+
+from app.encoding import FPS, video_args
+from app.hls import package_hls
+
+pytestmark = pytest.mark.skipif(not (shutil.which("ffmpeg") and shutil.which("ffprobe")), reason="needs ffmpeg")
+
+SCENES = [(3.37, "still"), (9.1, "animation"), (2.53, "still"), (5.71, "animation")]
+
+
+def _duration(p):
+    out = subprocess.run(["ffprobe", "-v", "error", "-show_entries", "format=duration", "-of", "csv=p=0", str(p)],
+                         capture_output=True, text=True, check=True).stdout
+    return float(out)
+
+
+def _stream_copied_mp4(td, segment_sec):
+    # scene clips as render_manim makes them (own keyframes, audio muxed with -shortest),
+    # joined with -c:v copy as in manim_render._concat
+    clips, scenes = [], []
+    for i, (dur, profile) in enumerate(SCENES):
+        clip = td / f"scene_{i}.mp4"
+        subprocess.run(["ffmpeg", "-y", "-v", "error", "-f", "lavfi", "-i", f"testsrc2=s=320x180:r={FPS}",
+                        "-f", "lavfi", "-i", "sine=frequency=440", "-t", f"{dur}",
+                        *video_args(profile, segment_sec), "-c:a", "aac", "-shortest", str(clip)], check=True)
+        clips.append(clip)
+        scenes.append({"index": i, "type": profile, "duration": _duration(clip)})
+    lst = td / "clips.txt"
+    lst.write_text("".join(f"file '{c.as_posix()}'\n" for c in clips))
+    out = td / "out.mp4"
+    subprocess.run(["ffmpeg", "-y", "-v", "error", "-f", "concat", "-safe", "0", "-i", str(lst),
+                    "-c:v", "copy", "-c:a", "aac", str(out)], check=True)
+    return out, scenes
+
+
+def test_stream_copied_scenes_each_get_their_own_segments(tmp_path):
+    mp4, scenes = _stream_copied_mp4(tmp_path, 4.0)
+    index = package_hls(mp4, scenes, tmp_path / "hls", 4.0)
+    chapters = index["scenes"]
+    assert [ch["index"] for ch in chapters] == [0, 1, 2, 3]
+    assert all(ch["segments"] for ch in chapters)
+    # no segment spans a scene boundary
+    owned = [s for ch in chapters for s in ch["segments"]]
+    assert len(owned) == len(set(owned))
+    assert json.loads((tmp_path / "hls" / "chapters.json").read_text()) == index